@@ -0,0 +1,243 @@
+import os
+from pathlib import Path
+
+import click
+
+from starhopper.formats.btdx.dedup import find_duplicates
+from starhopper.formats.btdx.file import BA2Container
+from starhopper.formats.btdx.optimize import DEFAULT_READ_SPEED, plan, repack
+from starhopper.formats.esm.file import ESMContainer
+from starhopper.formats.esm.index import EditorIDPass, ESMIndex, FieldTypePass
+from starhopper.formats.esm.query import Query
+
+
+@click.group()
+def main():
+    """
+    Command line utilities for Bethesda game files.
+    """
+
+
+@main.command()
+@click.argument(
+    "file", type=click.Path(exists=True, dir_okay=False, path_type=Path)
+)
+@click.argument("expression")
+@click.option(
+    "--no-cache",
+    is_flag=True,
+    help="Don't read or write the index cached alongside the file.",
+)
+@click.option(
+    "--index-fields",
+    is_flag=True,
+    help=(
+        "Index the field types of every record, so has_field() never reads"
+        " record bodies. Slow the first time, but cached for later queries."
+    ),
+)
+def query(file: Path, expression: str, no_cache: bool, index_fields: bool):
+    """
+    Lists the records in an ESM FILE matching a query EXPRESSION, such as:
+
+        type = NPC_ and flags & Deleted = 0 and edid like "Ship%"
+    """
+    try:
+        q = Query(expression)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="EXPRESSION")
+
+    passes = q.predicate.required_passes() | {EditorIDPass}
+    if index_fields:
+        passes.add(FieldTypePass)
+
+    with open(file, "rb") as handle:
+        esm = ESMContainer(handle)
+        index = ESMIndex.from_container(esm, passes, cache=not no_cache)
+        for row in q.rows(esm, index):
+            type_ = index.types[row].to_bytes(4, "little").decode("ascii")
+            click.echo(
+                f"{index.form_ids[row]:08X}\t{type_}\t"
+                f"{index.editor_id(row) or ''}"
+            )
+
+
+def _archives(paths: tuple[Path, ...]) -> list[Path]:
+    """
+    Expands any directories in PATHS to the .ba2 files inside them.
+    """
+    archives = []
+    for path in paths:
+        if path.is_dir():
+            archives.extend(sorted(path.glob("*.ba2")))
+        else:
+            archives.append(path)
+    return archives
+
+
+@main.command()
+@click.argument(
+    "paths",
+    nargs=-1,
+    required=True,
+    type=click.Path(exists=True, path_type=Path),
+)
+@click.option(
+    "--workers",
+    type=int,
+    default=None,
+    help="The number of files to decompress at once.",
+)
+def verify(paths: tuple[Path, ...], workers: int | None):
+    """
+    Checks .ba2 archives for corruption. PATHS may be archives or directories
+    containing them, such as the game's Data folder.
+
+    Each problem is printed as the archive, the file, and the reason. Exits
+    with a non-zero status if any were found.
+    """
+    archives = _archives(paths)
+    files = checked = elapsed = failures = 0
+    for archive in archives:
+        try:
+            with open(archive, "rb") as handle:
+                report = BA2Container(handle, cache=None).verify(
+                    workers=workers
+                )
+        except (ValueError, EOFError) as e:
+            click.echo(f"{archive}\t\t{e}")
+            failures += 1
+            continue
+
+        for failure in report.failures:
+            click.echo(f"{archive}\t{failure.path}\t{failure.reason}")
+
+        files += report.files
+        checked += report.bytes_checked
+        elapsed += report.elapsed
+        failures += len(report.failures)
+
+    click.echo(
+        f"Checked {files} files in {len(archives)} archives, "
+        f"{checked / (elapsed or 1) / 2 ** 20:.1f} MiB/s, {failures} problems",
+        err=True,
+    )
+    if failures:
+        raise SystemExit(1)
+
+
+@main.command()
+@click.argument(
+    "paths",
+    nargs=-1,
+    required=True,
+    type=click.Path(exists=True, path_type=Path),
+)
+@click.option(
+    "--workers",
+    type=int,
+    default=None,
+    help="The number of files to fingerprint at once.",
+)
+@click.option(
+    "--no-cache",
+    is_flag=True,
+    help="Don't read or write the fingerprints cached alongside archives.",
+)
+def dedup(paths: tuple[Path, ...], workers: int | None, no_cache: bool):
+    """
+    Finds files with identical contents in .ba2 archives. PATHS may be
+    archives or directories containing them.
+
+    Each duplicate is printed as its fingerprint, size, archive and path,
+    with the sets that would save the most space first.
+    """
+    try:
+        report = find_duplicates(
+            _archives(paths), workers=workers, cache=not no_cache
+        )
+    except (ValueError, EOFError) as e:
+        raise click.ClickException(str(e))
+
+    for group in report.groups:
+        for entry in group.entries:
+            click.echo(
+                f"{group.digest.hex()}\t{group.size}\t{entry.archive}\t"
+                f"{entry.path}"
+            )
+
+    click.echo(
+        f"{len(report.groups)} sets of duplicates in {report.files} files, "
+        f"{report.reclaimable / 2 ** 20:.1f} MiB reclaimable "
+        f"({report.hashed} fingerprinted, {report.cached} cached)",
+        err=True,
+    )
+
+
+@main.command("repack")
+@click.argument(
+    "source", type=click.Path(exists=True, dir_okay=False, path_type=Path)
+)
+@click.argument("destination", type=click.Path(dir_okay=False, path_type=Path))
+@click.option(
+    "--workers",
+    type=int,
+    default=None,
+    help="The number of files to compress at once.",
+)
+@click.option(
+    "--read-speed",
+    type=float,
+    default=DEFAULT_READ_SPEED / 2**20,
+    show_default=True,
+    help="The assumed speed of the disk, in MiB/s.",
+)
+def repack_(
+    source: Path, destination: Path, workers: int | None, read_speed: float
+):
+    """
+    Writes an optimized copy of the .ba2 archive SOURCE to DESTINATION.
+
+    Files are grouped by directory and type, and each type is compressed
+    with whichever codec is expected to load fastest. The estimated size
+    and load time of every type with every codec is printed, with the
+    chosen codecs marked with an asterisk.
+    """
+    if destination.resolve() == source.resolve():
+        raise click.BadParameter(
+            "must not be the same as SOURCE", param_hint="DESTINATION"
+        )
+
+    # The archive is planned before anything is written, then written to a
+    # temporary file that only replaces DESTINATION once it's complete.
+    temporary = destination.with_name(f"{destination.name}.tmp")
+    with open(source, "rb") as handle:
+        try:
+            container = BA2Container(handle, cache=None)
+            result = plan(container, read_speed=read_speed * 2**20)
+            with open(temporary, "wb") as output:
+                repack(container, output, workers=workers, using=result)
+            os.replace(temporary, destination)
+        except (ValueError, EOFError) as e:
+            raise click.ClickException(str(e))
+        finally:
+            temporary.unlink(missing_ok=True)
+
+    for t in result.types:
+        for estimate in t.estimates:
+            chosen = "*" if estimate is t.chosen else ""
+            click.echo(
+                f"{t.extension}\t{estimate.codec}{chosen}\t{estimate.size}\t"
+                f"{estimate.load_time * 1000:.1f}ms"
+            )
+
+    click.echo(
+        f"{result.stored_size / 2**20:.1f} MiB stored, "
+        f"{result.expected_size / 2**20:.1f} MiB expected, "
+        f"{result.expected_load_time:.2f}s expected load time",
+        err=True,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,22 @@
 import abc
+import bisect
 import dataclasses
+import itertools
+import re
+import threading
+import time
+from collections import OrderedDict
 from contextlib import contextmanager
 from pathlib import Path
-from typing import Iterator, BinaryIO
+from typing import Callable, Hashable, Iterable, Iterator, BinaryIO, Sequence
+
+
+def normalize_path(path: str) -> str:
+    """
+    Returns the form of a path used to look up files in an archive, which
+    is lowercase and separated by forward slashes.
+    """
+    return path.replace("\\", "/").strip("/").lower()
 
 
 @dataclasses.dataclass
@@ -16,8 +30,14 @@ class AbstractFile:
     container: "ArchiveContainer"
 
     @contextmanager
-    def open(self):
-        with self.container.open(self) as io:
+    def open(self, *, cache: bool = True):
+        """
+        Opens the file.
+
+        :param cache: Whether the container may serve the file from, and add
+                      it to, its :class:`EntryCache`.
+        """
+        with self.container.open(self, cache=cache) as io:
             yield io
 
     def extract_into(self, directory: Path, *, overwrite: bool = False):
@@ -30,6 +50,321 @@ class AbstractFile:
         self.container.extract_into(self, directory, overwrite=overwrite)
 
 
+@dataclasses.dataclass(frozen=True)
+class CacheStats:
+    hits: int
+    misses: int
+    evictions: int
+    #: The number of entries currently cached.
+    entries: int
+    #: The total size of the entries currently cached.
+    size: int
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        if not lookups:
+            return 0.0
+        return self.hits / lookups
+
+
+class EntryCache:
+    """
+    A thread-safe, least-recently-used cache of decompressed file contents,
+    limited by their total size.
+
+    Containers key entries with :meth:`ArchiveContainer.cache_key`, so one
+    cache can be shared by any number of archives.
+    """
+
+    def __init__(self, budget: int, *, max_entry_size: int | None = None):
+        """
+        :param budget: The most bytes of content to keep.
+        :param max_entry_size: Files larger than this are never cached.
+                               Defaults to a quarter of the budget.
+        """
+        self.budget = budget
+        self.max_entry_size = (
+            budget // 4 if max_entry_size is None else max_entry_size
+        )
+        self._entries: OrderedDict[Hashable, bytes] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def accepts(self, size: int) -> bool:
+        """
+        Returns True if a file of the given size can be cached.
+        """
+        return size <= self.max_entry_size
+
+    def get(self, key: Hashable) -> bytes | None:
+        with self._lock:
+            data = self._entries.get(key)
+            if data is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return data
+
+    def put(self, key: Hashable, data: bytes):
+        if not self.accepts(len(data)):
+            return
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+
+            self._entries[key] = data
+            self._size += len(data)
+            while self._size > self.budget:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+                self._evictions += 1
+
+    def get_or_load(self, key: Hashable, load: Callable[[], bytes]) -> bytes:
+        """
+        Returns the cached content for a key, calling load() to fill the
+        cache on a miss.
+
+        The lock isn't held while loading, so two threads missing on the same
+        key at once will both load it.
+        """
+        data = self.get(key)
+        if data is None:
+            data = load()
+            self.put(key, data)
+        return data
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+                entries=len(self._entries),
+                size=self._size,
+            )
+
+
+#: The cache shared by every container that isn't given its own.
+default_cache = EntryCache(256 * 1024 * 1024)
+
+_cache_tokens = itertools.count()
+
+
+@dataclasses.dataclass
+class ExtractProgress:
+    """
+    The progress of a bulk extraction, passed to its progress callback after
+    each file is written.
+    """
+
+    files_done: int
+    files_total: int
+    #: Uncompressed bytes written so far.
+    bytes_done: int
+    bytes_total: int
+    #: Seconds since the extraction started.
+    elapsed: float
+    #: Files that were already up to date, which are included in files_done.
+    files_skipped: int = 0
+
+    @property
+    def throughput(self) -> float:
+        """
+        Uncompressed bytes written per second.
+        """
+        if self.elapsed <= 0:
+            return 0.0
+        return self.bytes_done / self.elapsed
+
+
+def _translate_glob(pattern: str) -> str:
+    """
+    Translates a normalized glob pattern into a regular expression.
+    """
+    segments = pattern.split("/")
+    parts = []
+    for i, segment in enumerate(segments):
+        last = i == len(segments) - 1
+        if segment == "**":
+            # Any number of whole directories, or anything at all at the end.
+            parts.append(".*" if last else "(?:[^/]+/)*")
+            continue
+
+        j = 0
+        while j < len(segment):
+            c = segment[j]
+            j += 1
+            if c == "*":
+                parts.append("[^/]*")
+            elif c == "?":
+                parts.append("[^/]")
+            elif c == "[" and (end := segment.find("]", j + 1)) != -1:
+                body = segment[j:end]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                parts.append(f"[{body}]")
+                j = end + 1
+            else:
+                parts.append(re.escape(c))
+
+        if not last:
+            parts.append("/")
+    return "".join(parts)
+
+
+def _prefix_range(
+    paths: Sequence[str], prefix: str, lo: int = 0, hi: int | None = None
+) -> tuple[int, int]:
+    """
+    Returns the range of rows in sorted paths that start with a prefix.
+    """
+    hi = len(paths) if hi is None else hi
+    if not prefix:
+        return lo, hi
+    end = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return (
+        bisect.bisect_left(paths, prefix, lo, hi),
+        bisect.bisect_left(paths, end, lo, hi),
+    )
+
+
+def glob_rows(paths: Sequence[str], pattern: str) -> list[int]:
+    """
+    Returns the rows of every path matching a glob pattern, in order.
+
+    ``*`` and ``?`` never match a slash, ``**`` on its own matches any
+    number of directories, and ``[...]`` matches a set of characters.
+    Only paths starting with the pattern's literal prefix, such as
+    ``meshes/ships/`` in ``meshes/ships/**/*.mesh``, are looked at.
+
+    :param paths: Normalized paths, sorted.
+    :param pattern: The pattern, which is normalized first.
+    """
+    pattern = normalize_path(pattern)
+    literal = re.match(r"[^*?\[]*", pattern).group()
+    expression = re.compile(_translate_glob(pattern))
+    lo, hi = _prefix_range(paths, literal)
+    return [row for row in range(lo, hi) if expression.fullmatch(paths[row])]
+
+
+class PathIndex:
+    """
+    The files of an archive, sorted by normalized path so that every
+    directory, and every other prefix, is a contiguous range found by
+    binary search.
+
+    Listing a directory skips over each of its subdirectories with another
+    binary search, so it takes time proportional to what's listed rather
+    than to everything beneath the directory.
+    """
+
+    def __init__(self, files: Iterable[AbstractFile]):
+        entries = sorted(
+            ((normalize_path(file.path), file) for file in files),
+            key=lambda entry: entry[0],
+        )
+        #: The normalized path of every file, sorted.
+        self.paths: list[str] = [path for path, _ in entries]
+        self.files: list[AbstractFile] = [file for _, file in entries]
+
+    def __len__(self):
+        return len(self.paths)
+
+    def _range(self, prefix: str, lo: int = 0, hi: int | None = None):
+        """
+        Returns the range of rows whose paths start with a prefix.
+        """
+        return _prefix_range(self.paths, prefix, lo, hi)
+
+    @staticmethod
+    def _directory(directory: str) -> str:
+        directory = normalize_path(directory)
+        return f"{directory}/" if directory else ""
+
+    def get(self, path: str) -> AbstractFile | None:
+        """
+        Returns the file with the given path, if it exists.
+        """
+        path = normalize_path(path)
+        row = bisect.bisect_left(self.paths, path)
+        if row < len(self.paths) and self.paths[row] == path:
+            return self.files[row]
+        return None
+
+    def is_dir(self, directory: str) -> bool:
+        """
+        Returns True if any file is beneath the given directory.
+        """
+        lo, hi = self._range(self._directory(directory))
+        return lo < hi
+
+    def listdir(self, directory: str = "") -> tuple[list[str], list[str]]:
+        """
+        Returns the names of the subdirectories and files directly inside a
+        directory, each sorted. Names are normalized.
+
+        :param directory: The directory to list, or the root by default.
+        """
+        prefix = self._directory(directory)
+        lo, hi = self._range(prefix)
+        directories, files = [], []
+        while lo < hi:
+            name = self.paths[lo][len(prefix) :]
+            slash = name.find("/")
+            if slash == -1:
+                files.append(name)
+                lo += 1
+            else:
+                name = name[:slash]
+                directories.append(name)
+                lo = self._range(f"{prefix}{name}/", lo, hi)[1]
+        return directories, files
+
+    def walk(self, directory: str = "") -> Iterator[AbstractFile]:
+        """
+        Returns every file beneath a directory, recursively, sorted by path.
+
+        :param directory: The directory to walk, or the root by default.
+        """
+        lo, hi = self._range(self._directory(directory))
+        return iter(self.files[lo:hi])
+
+    def glob(self, pattern: str) -> list[AbstractFile]:
+        """
+        Returns every file matching a glob pattern, sorted by path, as
+        matched by :func:`glob_rows`.
+        """
+        return [self.files[row] for row in glob_rows(self.paths, pattern)]
+
+    def search(
+        self, expression: str | re.Pattern, directory: str = ""
+    ) -> list[AbstractFile]:
+        """
+        Returns every file beneath a directory whose normalized path matches
+        a regular expression anywhere, sorted by path.
+        """
+        if isinstance(expression, str):
+            expression = re.compile(expression)
+        lo, hi = self._range(self._directory(directory))
+        return [
+            self.files[row]
+            for row in range(lo, hi)
+            if expression.search(self.paths[row])
+        ]
+
+
 class ArchiveContainer(abc.ABC):
     """
     Provides a base class for working with files that contain other files in
@@ -48,13 +383,57 @@ class ArchiveContainer(abc.ABC):
         Returns an iterator over the files in the archive.
         """
 
+    def get(self, path: str) -> AbstractFile | None:
+        """
+        Returns the file with the given path, if it exists. Paths are
+        compared ignoring case and the direction of slashes.
+
+        :param path: The path of the file within the archive.
+        """
+        # Naive implementation that should be replaced by an index in
+        # subclasses.
+        path = normalize_path(path)
+        for file in self.files():
+            if normalize_path(file.path) == path:
+                return file
+        return None
+
+    def path_index(self) -> PathIndex:
+        """
+        Returns an index of the paths of every file, for listing directories
+        and matching patterns. It's built on first use, and rebuilt after
+        files are added or removed.
+        """
+        index = getattr(self, "_path_index", None)
+        if index is None:
+            index = self._path_index = PathIndex(self.files())
+        return index
+
     @abc.abstractmethod
     @contextmanager
-    def open(self, file: AbstractFile):
+    def open(self, file: AbstractFile, *, cache: bool = True):
         """
         Opens a file in the archive.
+
+        :param file: The file to open.
+        :param cache: Whether the file may be served from, and added to, the
+                      container's :class:`EntryCache`.
         """
 
+    def cache_key(self, index: Hashable) -> tuple[int, Hashable]:
+        """
+        Returns the key of a file in an :class:`EntryCache`.
+
+        Each container gets its own token the first time this is called, so
+        keys never outlive the container or collide with another one.
+
+        :param index: Identifies the file within this container.
+        """
+        token = getattr(self, "_cache_token", None)
+        if token is None:
+            token = self._cache_token = next(_cache_tokens)
+        return token, index
+
     def extract_into(
         self, file: AbstractFile, directory: Path, *, overwrite: bool = False
     ):
@@ -79,6 +458,88 @@ class ArchiveContainer(abc.ABC):
             with final_path.open("wb") as out:
                 out.write(io.read())
 
+    def extract_all(
+        self,
+        directory: Path,
+        files: Iterable[AbstractFile] | None = None,
+        *,
+        overwrite: bool = False,
+        workers: int | None = None,
+        progress: Callable[[ExtractProgress], None] | None = None,
+        incremental: bool = False,
+    ):
+        """
+        Extracts many files into a directory.
+
+        :param directory: The directory to extract into.
+        :param files: The files to extract, defaulting to every file in the
+                      archive.
+        :param overwrite: Whether to overwrite existing files.
+        :param workers: The number of files to decompress and write at once,
+                        if supported by the container.
+        :param progress: Called after each file has been written.
+        :param incremental: Skip files that haven't changed since they were
+                            last extracted, if supported by the container.
+                            Otherwise every file is written.
+        """
+        files = list(self.files() if files is None else files)
+        status = ExtractProgress(
+            files_done=0,
+            files_total=len(files),
+            bytes_done=0,
+            bytes_total=sum(file.size for file in files),
+            elapsed=0.0,
+        )
+        started = time.perf_counter()
+        for file in files:
+            self.extract_into(file, directory, overwrite=overwrite)
+            status.files_done += 1
+            status.bytes_done += file.size
+            status.elapsed = time.perf_counter() - started
+            if progress is not None:
+                progress(status)
+
+    def read_many(
+        self, files: Iterable[AbstractFile], *, ordered: bool = False
+    ) -> Iterator[tuple[AbstractFile, bytes]]:
+        """
+        Reads the contents of many files.
+
+        Containers that can should read the files in the order they're
+        stored, rather than the order they're given, unless ``ordered`` is
+        True.
+
+        :param files: The files to read.
+        :param ordered: Yield files in the order given.
+        :return: An iterator of (file, contents).
+        """
+        # Naive implementation that should be replaced by optimized methods
+        # in subclasses.
+        for file in files:
+            with file.open(cache=False) as io:
+                yield file, io.read()
+
+    def iter_contents(
+        self,
+        filter: Callable[[AbstractFile], bool] | None = None,
+        *,
+        workers: int | None = None,
+        max_inflight_bytes: int | None = None,
+    ) -> Iterator[tuple[AbstractFile, memoryview]]:
+        """
+        Streams the contents of every file in a single pass over the archive.
+
+        :param filter: Only files for which this returns True are read.
+        :param workers: The number of files to decompress at once, if
+                        supported by the container.
+        :param max_inflight_bytes: The most data read ahead of the caller,
+                                   if supported by the container.
+        :return: An iterator of (file, contents).
+        """
+        files = [f for f in self.files() if filter is None or filter(f)]
+        for file, data in self.read_many(files):
+            yield file, memoryview(data)
+
     def add(self, file: AbstractFile, content: bytes):
         """
         Adds a file to the archive. If the file already exists, it will be
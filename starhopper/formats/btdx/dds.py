@@ -0,0 +1,159 @@
+"""
+Builds DirectDraw Surface (.dds) headers for textures stored in DX10
+archives, which only store the texture data itself.
+"""
+import struct
+
+DDS_MAGIC = b"DDS "
+
+_HEADER = struct.Struct("<7I44s2I4s5I5I")
+_HEADER_DX10 = struct.Struct("<5I")
+#: The size of the headers written by :func:`dds_header`.
+HEADER_SIZE = len(DDS_MAGIC) + _HEADER.size + _HEADER_DX10.size
+
+DDSD_CAPS = 0x1
+DDSD_HEIGHT = 0x2
+DDSD_WIDTH = 0x4
+DDSD_PITCH = 0x8
+DDSD_PIXELFORMAT = 0x1000
+DDSD_MIPMAPCOUNT = 0x20000
+DDSD_LINEARSIZE = 0x80000
+DDPF_FOURCC = 0x4
+DDSCAPS_COMPLEX = 0x8
+DDSCAPS_TEXTURE = 0x1000
+DDSCAPS_MIPMAP = 0x400000
+DDSCAPS2_CUBEMAP_ALL_FACES = 0xFE00
+D3D10_RESOURCE_DIMENSION_TEXTURE2D = 3
+D3D11_RESOURCE_MISC_TEXTURECUBE = 0x4
+
+#: Bytes per 4x4 block of each block-compressed DXGI format.
+_BLOCK_SIZES = {
+    **dict.fromkeys(range(70, 73), 8),  # BC1
+    **dict.fromkeys(range(73, 79), 16),  # BC2, BC3
+    **dict.fromkeys(range(79, 82), 8),  # BC4
+    **dict.fromkeys(range(82, 85), 16),  # BC5
+    **dict.fromkeys(range(94, 100), 16),  # BC6H, BC7
+}
+
+#: Bits per pixel of each uncompressed DXGI format.
+_PIXEL_BITS = {
+    **dict.fromkeys(range(1, 5), 128),
+    **dict.fromkeys(range(5, 9), 96),
+    **dict.fromkeys(range(9, 23), 64),
+    **dict.fromkeys(range(23, 48), 32),
+    **dict.fromkeys(range(48, 60), 16),
+    **dict.fromkeys(range(60, 66), 8),
+    **dict.fromkeys((85, 86, 115), 16),
+    **dict.fromkeys(range(87, 94), 32),
+}
+
+
+def mip_size(dxgi_format: int, width: int, height: int) -> int | None:
+    """
+    Returns the size in bytes of a single mip level, or None if the format
+    isn't known.
+
+    :param dxgi_format: The DXGI_FORMAT of the texture.
+    :param width: The width of the mip level.
+    :param height: The height of the mip level.
+    """
+    width, height = max(1, width), max(1, height)
+    block = _BLOCK_SIZES.get(dxgi_format)
+    if block is not None:
+        return ((width + 3) // 4) * ((height + 3) // 4) * block
+
+    bits = _PIXEL_BITS.get(dxgi_format)
+    if bits is not None:
+        return (width * bits + 7) // 8 * height
+    return None
+
+
+def mips_size(
+    dxgi_format: int, width: int, height: int, start: int, end: int
+) -> int | None:
+    """
+    Returns the total size of the mip levels from start up to, but not
+    including, end, or None if the format isn't known.
+
+    :param width: The width of the largest mip level.
+    :param height: The height of the largest mip level.
+    """
+    total = 0
+    for level in range(start, end):
+        size = mip_size(dxgi_format, width >> level, height >> level)
+        if size is None:
+            return None
+        total += size
+    return total
+
+
+def dds_header(
+    width: int,
+    height: int,
+    mip_count: int,
+    dxgi_format: int,
+    *,
+    cubemap: bool = False,
+) -> bytes:
+    """
+    Returns the headers of a .dds file, using the DX10 extended header so
+    that any DXGI format can be described.
+
+    :param width: The width of the largest mip level.
+    :param height: The height of the largest mip level.
+    :param mip_count: The number of mip levels in the file.
+    :param dxgi_format: The DXGI_FORMAT of the texture.
+    :param cubemap: Whether the texture is a cube map with all six faces.
+    """
+    flags = (
+        DDSD_CAPS
+        | DDSD_HEIGHT
+        | DDSD_WIDTH
+        | DDSD_PIXELFORMAT
+        | DDSD_MIPMAPCOUNT
+    )
+    pitch = 0
+    if dxgi_format in _BLOCK_SIZES:
+        flags |= DDSD_LINEARSIZE
+        pitch = mip_size(dxgi_format, width, height)
+    elif dxgi_format in _PIXEL_BITS:
+        flags |= DDSD_PITCH
+        pitch = (max(1, width) * _PIXEL_BITS[dxgi_format] + 7) // 8
+
+    caps = DDSCAPS_TEXTURE
+    if mip_count > 1:
+        caps |= DDSCAPS_COMPLEX | DDSCAPS_MIPMAP
+    if cubemap:
+        caps |= DDSCAPS_COMPLEX
+
+    header = _HEADER.pack(
+        _HEADER.size,
+        flags,
+        height,
+        width,
+        pitch,
+        0,
+        mip_count,
+        b"\x00" * 44,
+        32,
+        DDPF_FOURCC,
+        b"DX10",
+        0,
+        0,
+        0,
+        0,
+        0,
+        caps,
+        DDSCAPS2_CUBEMAP_ALL_FACES if cubemap else 0,
+        0,
+        0,
+        0,
+    )
+    header_dx10 = _HEADER_DX10.pack(
+        dxgi_format,
+        D3D10_RESOURCE_DIMENSION_TEXTURE2D,
+        D3D11_RESOURCE_MISC_TEXTURECUBE if cubemap else 0,
+        1,
+        0,
+    )
+    return DDS_MAGIC + header + header_dx10
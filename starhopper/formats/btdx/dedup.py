@@ -0,0 +1,233 @@
+"""
+Finds files with identical contents within and across .ba2 archives.
+"""
+import contextlib
+import dataclasses
+import hashlib
+import time
+from array import array
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import BinaryIO, Iterable
+
+from starhopper.formats.archive import AbstractFile
+from starhopper.formats.btdx.file import (
+    COPY_BUFFER_SIZE,
+    BA2Container,
+    _reads_at_offset,
+)
+from starhopper.formats.common import (
+    FileIdentity,
+    read_columns,
+    sidecar_path,
+    write_columns,
+)
+
+#: Suffix of the fingerprint cache stored alongside an archive.
+FINGERPRINT_SUFFIX = ".shfp"
+FINGERPRINT_MAGIC = b"SHFP"
+#: The size of each fingerprint, in bytes.
+DIGEST_SIZE = 16
+
+
+@dataclasses.dataclass(frozen=True)
+class DuplicateEntry:
+    #: The archive containing the file.
+    archive: Path
+    #: The path of the file within the archive.
+    path: str
+
+
+@dataclasses.dataclass
+class DuplicateGroup:
+    """
+    A set of files with byte-identical contents.
+    """
+
+    #: The uncompressed size of each file.
+    size: int
+    digest: bytes
+    entries: list[DuplicateEntry]
+
+    @property
+    def reclaimable(self) -> int:
+        """
+        The uncompressed bytes saved by storing the contents only once.
+        """
+        return self.size * (len(self.entries) - 1)
+
+    @property
+    def across_archives(self) -> bool:
+        return len({entry.archive for entry in self.entries}) > 1
+
+
+@dataclasses.dataclass
+class DedupReport:
+    #: The number of files in every archive.
+    files: int
+    #: The number of files fingerprinted during this run.
+    hashed: int
+    #: The number of fingerprints read from the cache.
+    cached: int
+    #: The uncompressed bytes fingerprinted during this run.
+    bytes_hashed: int
+    #: The time taken, in seconds.
+    elapsed: float
+    #: Every set of duplicates, with the most reclaimable space first.
+    groups: list[DuplicateGroup]
+
+    @property
+    def reclaimable(self) -> int:
+        return sum(group.reclaimable for group in self.groups)
+
+
+def fingerprint(file: AbstractFile) -> bytes:
+    """
+    Returns a digest of the uncompressed contents of a file.
+    """
+    digest = hashlib.blake2b(digest_size=DIGEST_SIZE)
+    with file.open(cache=False) as reader:
+        while chunk := reader.read(COPY_BUFFER_SIZE):
+            digest.update(chunk)
+    return digest.digest()
+
+
+def _read_cache(handle: BinaryIO) -> dict[int, bytes]:
+    """
+    Returns the cached fingerprints of an archive, by offset of the file's
+    data.
+    """
+    path = sidecar_path(handle, FINGERPRINT_SUFFIX)
+    if path is None:
+        return {}
+
+    columns = read_columns(
+        path, FINGERPRINT_MAGIC, FileIdentity.of(handle.name)
+    )
+    if columns is None:
+        return {}
+
+    digests = columns["digests"]
+    return {
+        offset: digests[i * DIGEST_SIZE : (i + 1) * DIGEST_SIZE]
+        for i, offset in enumerate(columns["offsets"])
+    }
+
+
+def _write_cache(handle: BinaryIO, fingerprints: dict[int, bytes]):
+    path = sidecar_path(handle, FINGERPRINT_SUFFIX)
+    if path is None:
+        return
+
+    try:
+        write_columns(
+            path,
+            FINGERPRINT_MAGIC,
+            FileIdentity.of(handle.name),
+            {
+                "offsets": array("Q", fingerprints.keys()),
+                "digests": b"".join(fingerprints.values()),
+            },
+        )
+    except OSError:
+        pass
+
+
+def find_duplicates(
+    archives: Iterable[Path | str],
+    *,
+    workers: int | None = None,
+    cache: bool = True,
+) -> DedupReport:
+    """
+    Finds every set of files with identical contents in a group of archives.
+
+    Files are first grouped by size, and only files that share their size
+    with another file are fingerprinted, on a pool of threads. Empty files
+    are ignored.
+
+    Fingerprints are cached alongside each archive by the offset of the
+    file's data, and the whole cache is thrown away if the archive changes,
+    so later runs only fingerprint files in new or changed archives.
+
+    :param archives: The .ba2 files to search.
+    :param workers: The number of files to fingerprint at once.
+    :param cache: Whether to read and write the fingerprint caches.
+    """
+    started = time.perf_counter()
+    archives = [Path(archive) for archive in archives]
+
+    with contextlib.ExitStack() as stack:
+        handles = [stack.enter_context(open(a, "rb")) for a in archives]
+        containers = [BA2Container(h, cache=None) for h in handles]
+
+        files = 0
+        by_size: dict[int, list[tuple[int, AbstractFile]]] = defaultdict(list)
+        for mount, container in enumerate(containers):
+            for file in container.files():
+                files += 1
+                if file.size:
+                    by_size[file.size].append((mount, file))
+
+        candidates = [
+            (mount, containers[mount].offset(file), file)
+            for entries in by_size.values()
+            if len(entries) > 1
+            for mount, file in entries
+        ]
+
+        known = [_read_cache(h) if cache else {} for h in handles]
+        # Files that need fingerprinting, in the order they're stored.
+        missing = sorted(
+            (
+                (mount, offset, file)
+                for mount, offset, file in candidates
+                if offset not in known[mount]
+            ),
+            key=lambda c: (c[0], c[1]),
+        )
+
+        # Archives that can't be read at an offset have to seek their shared
+        # handle, so their files are fingerprinted on this thread instead,
+        # while the pool works through the rest.
+        parallel = [_reads_at_offset(handle) for handle in handles]
+        with ThreadPoolExecutor(workers) as pool:
+            digests = pool.map(
+                lambda c: fingerprint(c[2]),
+                [c for c in missing if parallel[c[0]]],
+            )
+            for mount, offset, file in missing:
+                if parallel[mount]:
+                    known[mount][offset] = next(digests)
+                else:
+                    known[mount][offset] = fingerprint(file)
+
+        if cache:
+            changed = {mount for mount, _, _ in missing}
+            for mount in sorted(changed):
+                _write_cache(handles[mount], known[mount])
+
+    duplicates: dict[tuple[int, bytes], list[DuplicateEntry]] = defaultdict(
+        list
+    )
+    for mount, offset, file in candidates:
+        duplicates[file.size, known[mount][offset]].append(
+            DuplicateEntry(archive=archives[mount], path=file.path)
+        )
+
+    groups = [
+        DuplicateGroup(size=size, digest=digest, entries=entries)
+        for (size, digest), entries in duplicates.items()
+        if len(entries) > 1
+    ]
+    groups.sort(key=lambda group: group.reclaimable, reverse=True)
+
+    return DedupReport(
+        files=files,
+        hashed=len(missing),
+        cached=len(candidates) - len(missing),
+        bytes_hashed=sum(file.size for _, _, file in missing),
+        elapsed=time.perf_counter() - started,
+        groups=groups,
+    )
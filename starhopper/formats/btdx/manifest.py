@@ -0,0 +1,130 @@
+"""
+Records what an extraction wrote, so that running it again only rewrites
+the files that changed.
+"""
+import dataclasses
+from array import array
+from pathlib import Path
+
+from starhopper.formats.archive import normalize_path
+from starhopper.formats.common import FileIdentity, read_columns, write_columns
+
+#: The name of the manifest stored in an extraction's output directory.
+MANIFEST_NAME = ".shmanifest"
+MANIFEST_MAGIC = b"SHEM"
+#: The size of the digest of each file's stored data, in bytes.
+DIGEST_SIZE = 16
+
+# The manifest can describe files from many archives, so each row records
+# its own archive rather than the cache as a whole.
+_IDENTITY = FileIdentity(size=0, mtime_ns=0)
+
+
+@dataclasses.dataclass(frozen=True)
+class ManifestEntry:
+    #: The archive the file was extracted from.
+    archive: FileIdentity
+    #: Where the file's data starts in the archive.
+    offset: int
+    #: The size of the file's data as it's stored in the archive.
+    packed_size: int
+    #: The size of the extracted file.
+    size: int
+    #: A digest of the file's data as it's stored in the archive.
+    digest: bytes
+    #: The modification time of the extracted file once it was written.
+    mtime_ns: int
+
+
+class ExtractManifest:
+    """
+    The manifest of an output directory, with an entry for every file
+    extracted into it, by normalized path.
+    """
+
+    def __init__(self, directory: Path):
+        self.path = directory / MANIFEST_NAME
+        self.entries: dict[str, ManifestEntry] = {}
+
+        columns = read_columns(self.path, MANIFEST_MAGIC, _IDENTITY)
+        if columns is None or not columns["offsets"]:
+            return
+
+        digests = columns["digests"]
+        for row, path in enumerate(
+            columns["paths"].decode("utf-8").split("\n")
+        ):
+            self.entries[path] = ManifestEntry(
+                archive=FileIdentity(
+                    size=columns["archive_sizes"][row],
+                    mtime_ns=columns["archive_mtimes"][row],
+                ),
+                offset=columns["offsets"][row],
+                packed_size=columns["packed_sizes"][row],
+                size=columns["sizes"][row],
+                digest=digests[row * DIGEST_SIZE : (row + 1) * DIGEST_SIZE],
+                mtime_ns=columns["mtimes"][row],
+            )
+
+    def get(self, path: str) -> ManifestEntry | None:
+        return self.entries.get(normalize_path(path))
+
+    def record(self, path: str, entry: ManifestEntry):
+        self.entries[normalize_path(path)] = entry
+
+    @staticmethod
+    def output_unchanged(entry: ManifestEntry, output: Path) -> bool:
+        """
+        True if an extracted file hasn't been touched since it was written.
+        """
+        try:
+            stat = output.stat()
+        except FileNotFoundError:
+            return False
+        return stat.st_size == entry.size and stat.st_mtime_ns == entry.mtime_ns
+
+    def unchanged(
+        self,
+        path: str,
+        output: Path,
+        archive: FileIdentity | None,
+        offset: int,
+        packed_size: int,
+        size: int,
+    ) -> bool:
+        """
+        True if a file was extracted from the same place in the same version
+        of an archive, and hasn't been touched since, so it can be skipped
+        without reading it.
+        """
+        entry = self.get(path)
+        return (
+            entry is not None
+            and archive is not None
+            and offset >= 0
+            and entry.archive == archive
+            and entry.offset == offset
+            and entry.packed_size == packed_size
+            and entry.size == size
+            and self.output_unchanged(entry, output)
+        )
+
+    def save(self):
+        entries = self.entries.values()
+        write_columns(
+            self.path,
+            MANIFEST_MAGIC,
+            _IDENTITY,
+            {
+                "paths": "\n".join(self.entries).encode("utf-8"),
+                "archive_sizes": array("Q", [e.archive.size for e in entries]),
+                "archive_mtimes": array(
+                    "Q", [e.archive.mtime_ns for e in entries]
+                ),
+                "offsets": array("q", [e.offset for e in entries]),
+                "packed_sizes": array("Q", [e.packed_size for e in entries]),
+                "sizes": array("Q", [e.size for e in entries]),
+                "digests": b"".join(e.digest for e in entries),
+                "mtimes": array("Q", [e.mtime_ns for e in entries]),
+            },
+        )
@@ -0,0 +1,236 @@
+"""
+Picks the order and codecs a .ba2 archive is written with, so that it loads
+as quickly as possible.
+"""
+import dataclasses
+import time
+import zlib
+from collections import defaultdict
+from typing import BinaryIO, Iterable
+
+import lz4.frame
+
+from starhopper.formats.archive import AbstractFile, normalize_path
+from starhopper.formats.btdx.file import BA2Container, compress, extension
+
+#: The codecs tried for each type of file, from fastest to smallest.
+CANDIDATES = ("none", "lz4", "lz4:9", "zlib:1", "zlib", "zlib:9")
+#: The assumed speed of reading the archive from disk, in bytes per second.
+#: This is a conservative figure for an SSD.
+DEFAULT_READ_SPEED = 250 * 1024 * 1024
+#: How much of each type of file is compressed to pick its codec.
+SAMPLE_SIZE = 4 * 1024 * 1024
+
+
+@dataclasses.dataclass(frozen=True)
+class CodecEstimate:
+    codec: str
+    #: The estimated size of every file of the type once compressed.
+    size: int
+    #: The estimated time to read and decompress every file of the type, in
+    #: seconds.
+    load_time: float
+
+
+@dataclasses.dataclass
+class TypeReport:
+    #: The lowercase extension without the dot.
+    extension: str
+    files: int
+    #: The uncompressed size of every file of the type.
+    size: int
+    #: The size of every file of the type as it's currently stored.
+    stored_size: int
+    #: The uncompressed bytes compressed to make the estimates.
+    sampled: int
+    #: The estimate for every candidate codec, in the order tried.
+    estimates: list[CodecEstimate]
+    #: The estimate for the chosen codec.
+    chosen: CodecEstimate
+
+
+@dataclasses.dataclass
+class RepackPlan:
+    #: The codec to use for each extension, as passed to
+    #: :meth:`BA2Container.save`.
+    codecs: dict[str, str]
+    types: list[TypeReport]
+    read_speed: float
+
+    @property
+    def stored_size(self) -> int:
+        """
+        The size of every file as it's currently stored.
+        """
+        return sum(t.stored_size for t in self.types)
+
+    @property
+    def expected_size(self) -> int:
+        """
+        The estimated size of every file once repacked.
+        """
+        return sum(t.chosen.size for t in self.types)
+
+    @property
+    def expected_load_time(self) -> float:
+        """
+        The estimated time to read and decompress every file once repacked,
+        in seconds.
+        """
+        return sum(t.chosen.load_time for t in self.types)
+
+
+def locality_key(file: AbstractFile) -> tuple[str, str, str]:
+    """
+    Sorts files by directory, then extension, then name, so that files
+    that are loaded together are stored together.
+    """
+    directory, _, name = normalize_path(file.path).rpartition("/")
+    return directory, extension(name), name
+
+
+def _sample(files: list[AbstractFile], budget: int) -> list[AbstractFile]:
+    """
+    Picks files spread evenly through a list until their total size reaches
+    the budget.
+    """
+    total = sum(file.size for file in files)
+    if not total or budget <= 0:
+        return []
+
+    wanted = -(-budget * len(files) // total)
+    sample = []
+    size = 0
+    for file in files[:: max(1, len(files) // wanted)]:
+        if size >= budget:
+            break
+        sample.append(file)
+        size += file.size
+    return sample
+
+
+def _measure(contents: Iterable[bytes], codec: str) -> tuple[int, int, float]:
+    """
+    Compresses every sample with a codec, returning the total uncompressed
+    and compressed sizes and the time taken to decompress them again.
+    """
+    unpacked = packed = 0
+    elapsed = 0.0
+    for data in contents:
+        packed_size, stored = compress(data, codec)
+        unpacked += len(data)
+        packed += packed_size or len(data)
+        if packed_size == 0:
+            continue
+
+        started = time.perf_counter()
+        if codec.startswith("lz4"):
+            lz4.frame.decompress(stored)
+        else:
+            zlib.decompress(stored)
+        elapsed += time.perf_counter() - started
+    return unpacked, packed, elapsed
+
+
+def plan(
+    container: BA2Container,
+    *,
+    candidates: Iterable[str] = CANDIDATES,
+    read_speed: float = DEFAULT_READ_SPEED,
+    sample_size: int = SAMPLE_SIZE,
+) -> RepackPlan:
+    """
+    Picks a codec for each type of file in an archive.
+
+    Up to ``sample_size`` bytes of each type are compressed with every
+    candidate codec. The codec with the lowest estimated load time, which is
+    the time to read the compressed files at ``read_speed`` plus the time to
+    decompress them, is chosen. Ties go to the earlier candidate, so files
+    that don't compress are stored as they are.
+
+    Files that don't shrink at all are always stored uncompressed when the
+    archive is saved, whatever the codec for their type.
+
+    :param container: The archive to plan for.
+    :param candidates: The codecs to try, as accepted by :func:`compress`.
+    :param read_speed: The assumed speed of the disk, in bytes per second.
+    :param sample_size: How much of each type to compress, which must be
+                        positive.
+    """
+    if sample_size <= 0:
+        raise ValueError(f"Sample size must be positive, got {sample_size}")
+
+    candidates = list(candidates)
+    by_type: dict[str, list[AbstractFile]] = defaultdict(list)
+    for file in container.files():
+        by_type[extension(file.path)].append(file)
+
+    types = []
+    for ext, files in sorted(by_type.items()):
+        sample = _sample(files, sample_size)
+        contents = [data for _, data in container.read_many(sample)]
+        size = sum(file.size for file in files)
+
+        estimates = []
+        for codec in candidates:
+            unpacked, packed, elapsed = _measure(contents, codec)
+            # Scale the sample up to every file of the type.
+            scale = size / unpacked if unpacked else 0.0
+            estimates.append(
+                CodecEstimate(
+                    codec=codec,
+                    size=round(packed * scale),
+                    load_time=(packed / read_speed + elapsed) * scale,
+                )
+            )
+
+        types.append(
+            TypeReport(
+                extension=ext,
+                files=len(files),
+                size=size,
+                stored_size=sum(map(container.stored_size, files)),
+                sampled=sum(map(len, contents)),
+                estimates=estimates,
+                chosen=min(estimates, key=lambda e: e.load_time),
+            )
+        )
+
+    return RepackPlan(
+        codecs={t.extension: t.chosen.codec for t in types},
+        types=types,
+        read_speed=read_speed,
+    )
+
+
+def repack(
+    container: BA2Container,
+    io: BinaryIO,
+    *,
+    workers: int | None = None,
+    using: RepackPlan | None = None,
+    **kwargs,
+) -> RepackPlan:
+    """
+    Writes an optimized copy of an archive.
+
+    Every file is decompressed and compressed again with the codec picked
+    for its type by :func:`plan`, and files are written in
+    :func:`locality_key` order.
+
+    :param container: The archive to repack.
+    :param io: The seekable file to write to.
+    :param workers: The number of files to compress at once.
+    :param using: A plan already made by :func:`plan`, instead of making a
+                  new one.
+    :param kwargs: Passed on to :func:`plan`.
+    """
+    result = plan(container, **kwargs) if using is None else using
+    container.save(
+        io,
+        codecs=result.codecs,
+        workers=workers,
+        order=locality_key,
+        recompress=True,
+    )
+    return result
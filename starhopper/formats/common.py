@@ -1,4 +1,11 @@
 import dataclasses
+import os
+import sys
+from array import array
+from pathlib import Path
+from typing import BinaryIO
+
+from starhopper.io import BinaryReader, BinaryWriter
 
 
 @dataclasses.dataclass
@@ -13,3 +20,128 @@ class Location:
     @property
     def size(self):
         return self.end - self.start
+
+
+@dataclasses.dataclass(frozen=True)
+class FileIdentity:
+    """
+    Cheaply identifies a specific version of a file on disk.
+
+    Used to key caches that are stored alongside the files they describe, so
+    that they are thrown away when the game is patched.
+    """
+
+    size: int
+    mtime_ns: int
+
+    @classmethod
+    def of(cls, path: Path) -> "FileIdentity":
+        stat = os.stat(path)
+        return cls(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+
+
+def sidecar_path(file: BinaryIO, suffix: str) -> Path | None:
+    """
+    Returns the path of a cache file stored alongside an open file, or None
+    if the file doesn't live on disk.
+
+    :param file: The open file being cached.
+    :param suffix: The suffix appended to the file's name.
+    """
+    name = getattr(file, "name", None)
+    if not isinstance(name, str):
+        return None
+
+    path = Path(name)
+    return path.with_name(path.name + suffix)
+
+
+def write_columns(
+    path: Path,
+    magic: bytes,
+    identity: FileIdentity,
+    columns: dict[str, array | bytes],
+):
+    """
+    Writes a set of named columns to a cache file.
+
+    Arrays are always stored little-endian. The file is written to a temporary
+    location first and then moved into place, so readers never see a partial
+    cache.
+
+    :param path: The destination path.
+    :param magic: A 4-byte identifier for the type of cache.
+    :param identity: The identity of the file the cache was built from.
+    :param columns: The columns to store.
+    """
+    temporary = path.with_name(f"{path.name}.tmp")
+    with open(temporary, "wb") as f:
+        io = BinaryWriter(f)
+        io.write(magic)
+        io.uint64(identity.size)
+        io.uint64(identity.mtime_ns)
+        io.uint32(len(columns))
+        for name, column in columns.items():
+            encoded = name.encode("ascii")
+            io.uint16(len(encoded))
+            io.write(encoded)
+            if isinstance(column, array):
+                io.write(column.typecode.encode("ascii"))
+                if sys.byteorder == "big":
+                    column = array(column.typecode, column)
+                    column.byteswap()
+                data = column.tobytes()
+            else:
+                io.write(b"\x00")
+                data = bytes(column)
+            io.uint64(len(data))
+            io.write(data)
+    os.replace(temporary, path)
+
+
+def read_columns(
+    path: Path, magic: bytes, identity: FileIdentity
+) -> dict[str, array | bytes] | None:
+    """
+    Reads a cache file written by :func:`write_columns`.
+
+    :param path: The cache file to read.
+    :param magic: The expected 4-byte identifier.
+    :param identity: The identity of the file the cache should describe.
+    :return: The stored columns, or None if the cache is missing or stale.
+    """
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return None
+
+    with f:
+        io = BinaryReader(f)
+        try:
+            if io.read(4) != magic:
+                return None
+            if FileIdentity(io.uint64(), io.uint64()) != identity:
+                return None
+
+            columns = {}
+            for _ in range(io.uint32()):
+                name = io.read(io.uint16()).decode("ascii")
+                typecode = io.read(1)
+                size = io.uint64()
+                data = io.read(size) if size else b""
+                if len(data) != size:
+                    return None
+
+                if typecode == b"\x00":
+                    columns[name] = data
+                    continue
+
+                column = array(typecode.decode("ascii"))
+                column.frombytes(data)
+                if sys.byteorder == "big":
+                    column.byteswap()
+                columns[name] = column
+        except EOFError:
+            return None
+
+    return columns
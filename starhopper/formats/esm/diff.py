@@ -0,0 +1,361 @@
+"""
+Merkle-hashed comparisons between two versions of an ESM file.
+"""
+import dataclasses
+import hashlib
+import struct
+from array import array
+from collections import defaultdict
+from typing import Iterator
+
+from starhopper.formats.common import (
+    FileIdentity,
+    read_columns,
+    sidecar_path,
+    write_columns,
+)
+from starhopper.formats.esm.file import (
+    ESMContainer,
+    Field,
+    Group,
+    Record,
+    RecordFlag,
+)
+
+#: Suffix of the hash tree cache stored alongside an ESM file.
+HASH_TREE_SUFFIX = ".shhash"
+HASH_TREE_MAGIC = b"SHHT"
+DIGEST_SIZE = 16
+
+NODE_GROUP = 0
+NODE_RECORD = 1
+
+_CHILD_TOKEN = struct.Struct("<BII")
+_RECORD_TOKEN = struct.Struct("<4sI")
+
+
+@dataclasses.dataclass
+class FieldChange:
+    type: bytes
+    #: The occurrence of this field type within the record, for records that
+    #: repeat the same field.
+    index: int
+    old: bytes | None
+    new: bytes | None
+
+
+@dataclasses.dataclass
+class RecordChange:
+    form_id: int
+    type: bytes
+    fields: list[FieldChange]
+
+
+@dataclasses.dataclass
+class ESMDiff:
+    added: list[int]
+    removed: list[int]
+    modified: list[RecordChange]
+
+
+class HashTree:
+    """
+    A Merkle tree of record and group hashes for a single ESM file.
+
+    Every record is hashed over its type, flags and (decompressed) field
+    data. Every group is hashed over the keys and hashes of its children, so
+    when two trees have the same hash for a group, everything beneath it is
+    known to be identical and can be skipped.
+
+    Nodes are stored flattened in file order across parallel columns, with
+    groups preceding their children.
+    """
+
+    def __init__(self, columns: dict[str, array | bytes]):
+        #: Either NODE_GROUP or NODE_RECORD.
+        self.kinds: array = columns["kinds"]
+        #: The form ID of a record, or the raw label of a group.
+        self.keys: array = columns["keys"]
+        #: The record type of a record, or the group type of a group.
+        self.types: array = columns["types"]
+        self.offsets: array = columns["offsets"]
+        #: The number of nodes beneath each node.
+        self.extents: array = columns["extents"]
+        self.digests: bytes = columns["digests"]
+
+    def __len__(self):
+        return len(self.kinds)
+
+    @property
+    def columns(self) -> dict[str, array | bytes]:
+        return {
+            "kinds": self.kinds,
+            "keys": self.keys,
+            "types": self.types,
+            "offsets": self.offsets,
+            "extents": self.extents,
+            "digests": self.digests,
+        }
+
+    def digest(self, node: int) -> bytes:
+        return self.digests[node * DIGEST_SIZE : (node + 1) * DIGEST_SIZE]
+
+    def children(self, node: int | None = None) -> Iterator[int]:
+        """
+        Iterates over the direct children of a node, or over the top-level
+        groups if no node is given.
+        """
+        if node is None:
+            child, end = 0, len(self)
+        else:
+            child, end = node + 1, node + self.extents[node] + 1
+
+        while child < end:
+            yield child
+            child += self.extents[child] + 1
+
+    def records(self, node: int) -> Iterator[int]:
+        """
+        Iterates over every record at or beneath a node.
+        """
+        for child in range(node, node + self.extents[node] + 1):
+            if self.kinds[child] == NODE_RECORD:
+                yield child
+
+    @classmethod
+    def build(cls, esm: ESMContainer) -> "HashTree":
+        """
+        Builds a new hash tree by reading every record in the file.
+        """
+        kinds = array("B")
+        keys = array("I")
+        types = array("I")
+        offsets = array("Q")
+        extents = array("I")
+        digests = bytearray()
+
+        # Open groups, as (node, end offset, hasher).
+        stack: list[tuple] = []
+
+        def finish(node: int, digest: bytes):
+            digests[node * DIGEST_SIZE : (node + 1) * DIGEST_SIZE] = digest
+            if stack:
+                stack[-1][2].update(
+                    _CHILD_TOKEN.pack(kinds[node], keys[node], types[node])
+                )
+                stack[-1][2].update(digest)
+
+        def close():
+            node, _, hasher = stack.pop()
+            extents[node] = len(kinds) - node - 1
+            finish(node, hasher.digest())
+
+        for item in esm.walk():
+            while stack and item.loc.start >= stack[-1][1]:
+                close()
+
+            node = len(kinds)
+            offsets.append(item.loc.start)
+            extents.append(0)
+            digests.extend(bytes(DIGEST_SIZE))
+
+            if isinstance(item, Group):
+                kinds.append(NODE_GROUP)
+                keys.append(int.from_bytes(item.label, "little"))
+                types.append(item.group_type)
+                stack.append(
+                    (
+                        node,
+                        item.loc.end,
+                        hashlib.blake2b(digest_size=DIGEST_SIZE),
+                    )
+                )
+                continue
+
+            kinds.append(NODE_RECORD)
+            keys.append(item.form_id)
+            types.append(int.from_bytes(item.type, "little"))
+
+            hasher = hashlib.blake2b(digest_size=DIGEST_SIZE)
+            hasher.update(
+                _RECORD_TOKEN.pack(
+                    item.type, int(item.flags) & ~RecordFlag.Compressed.value
+                )
+            )
+            hasher.update(item.body())
+            finish(node, hasher.digest())
+
+        while stack:
+            close()
+
+        return cls(
+            {
+                "kinds": kinds,
+                "keys": keys,
+                "types": types,
+                "offsets": offsets,
+                "extents": extents,
+                "digests": bytes(digests),
+            }
+        )
+
+    @classmethod
+    def from_container(
+        cls, esm: ESMContainer, *, cache: bool = True
+    ) -> "HashTree":
+        """
+        Returns the hash tree for an open ESM file, using the cache stored
+        alongside the file when it's still valid.
+
+        :param esm: The ESM file to hash.
+        :param cache: Whether to read and write the on-disk cache. Files that
+                      aren't on disk are never cached.
+        """
+        cache_path = sidecar_path(esm.file, HASH_TREE_SUFFIX)
+        if not cache or cache_path is None:
+            return cls.build(esm)
+
+        identity = FileIdentity.of(esm.file.name)
+
+        columns = read_columns(cache_path, HASH_TREE_MAGIC, identity)
+        if columns is not None:
+            return cls(columns)
+
+        tree = cls.build(esm)
+        try:
+            write_columns(cache_path, HASH_TREE_MAGIC, identity, tree.columns)
+        except OSError:
+            # Game installs are often read-only, which just means we'll be
+            # building the tree again next time.
+            pass
+        return tree
+
+
+def _child_key(tree: HashTree, node: int) -> tuple[int, int, int]:
+    if tree.kinds[node] == NODE_RECORD:
+        return NODE_RECORD, tree.keys[node], 0
+    return NODE_GROUP, tree.keys[node], tree.types[node]
+
+
+def _compare_children(
+    old: HashTree,
+    old_node: int | None,
+    new: HashTree,
+    new_node: int | None,
+    removed: dict[int, int],
+    added: dict[int, int],
+    modified: list[tuple[int, int]],
+):
+    old_children = {_child_key(old, c): c for c in old.children(old_node)}
+    new_children = {_child_key(new, c): c for c in new.children(new_node)}
+
+    for key, old_child in old_children.items():
+        new_child = new_children.get(key)
+        if new_child is None:
+            for record in old.records(old_child):
+                removed[old.keys[record]] = record
+            continue
+
+        if old.digest(old_child) == new.digest(new_child):
+            # Identical subtree, nothing below here can have changed.
+            continue
+
+        if key[0] == NODE_RECORD:
+            modified.append((old_child, new_child))
+        else:
+            _compare_children(
+                old, old_child, new, new_child, removed, added, modified
+            )
+
+    for key, new_child in new_children.items():
+        if key not in old_children:
+            for record in new.records(new_child):
+                added[new.keys[record]] = record
+
+
+def _fields_by_type(record: Record) -> dict[bytes, list[Field]]:
+    result = defaultdict(list)
+    for field in record.fields():
+        result[field.type].append(field)
+    return result
+
+
+def _field_changes(old: Record, new: Record) -> list[FieldChange]:
+    old_fields = _fields_by_type(old)
+    new_fields = _fields_by_type(new)
+
+    changes = []
+    for type_ in dict.fromkeys([*old_fields, *new_fields]):
+        before = old_fields.get(type_, [])
+        after = new_fields.get(type_, [])
+        for index in range(max(len(before), len(after))):
+            old_data = before[index].data if index < len(before) else None
+            new_data = after[index].data if index < len(after) else None
+            if old_data != new_data:
+                changes.append(FieldChange(type_, index, old_data, new_data))
+
+    return changes
+
+
+def _read_record(esm: ESMContainer, offset: int) -> Record:
+    esm.io.seek(offset)
+    return esm.parse_record()
+
+
+def compare(
+    old: ESMContainer,
+    new: ESMContainer,
+    *,
+    cache: bool = True,
+    fields: bool = True,
+) -> ESMDiff:
+    """
+    Compares two versions of an ESM file, returning the form IDs of every
+    record that was added, removed or modified.
+
+    Unchanged groups are skipped without reading any of their records, so
+    once both hash trees are cached only the changed records are read from
+    disk.
+
+    :param old: The previous version of the file.
+    :param new: The current version of the file.
+    :param cache: Whether to use the hash trees cached alongside each file.
+    :param fields: Whether to include field-level changes for modified
+                   records.
+    """
+    old_tree = HashTree.from_container(old, cache=cache)
+    new_tree = HashTree.from_container(new, cache=cache)
+
+    removed: dict[int, int] = {}
+    added: dict[int, int] = {}
+    modified: list[tuple[int, int]] = []
+    _compare_children(old_tree, None, new_tree, None, removed, added, modified)
+
+    # A record that moved between groups (such as a cell changing blocks)
+    # shows up as both removed and added.
+    for form_id in removed.keys() & added.keys():
+        old_node, new_node = removed.pop(form_id), added.pop(form_id)
+        if old_tree.digest(old_node) != new_tree.digest(new_node):
+            modified.append((old_node, new_node))
+
+    changes = []
+    for old_node, new_node in sorted(
+        modified, key=lambda m: old_tree.keys[m[0]]
+    ):
+        old_record = _read_record(old, old_tree.offsets[old_node])
+        new_record = _read_record(new, new_tree.offsets[new_node])
+        changes.append(
+            RecordChange(
+                form_id=new_record.form_id,
+                type=new_record.type,
+                fields=(
+                    _field_changes(old_record, new_record) if fields else []
+                ),
+            )
+        )
+
+    return ESMDiff(
+        added=sorted(added),
+        removed=sorted(removed),
+        modified=changes,
+    )
@@ -1,8 +1,9 @@
 import dataclasses
 import enum
+import struct
 import zlib
 from io import BytesIO
-from typing import BinaryIO, Iterator, Any
+from typing import BinaryIO, Iterator, Any, Collection
 
 from starhopper.formats.common import Location
 from starhopper.io import BinaryReader
@@ -111,7 +112,44 @@ class Record:
     loc: Location
     file: "ESMContainer"
 
-    def fields(self):
+    def body(self) -> bytes:
+        """
+        Returns the raw field data of the record, decompressed if needed.
+        """
+        if self.size == 0:
+            return b""
+
+        self.file.io.seek(self.loc.start + 24)
+        if self.flags & RecordFlag.Compressed:
+            decompressed_size = self.file.io.uint32()
+            return zlib.decompress(
+                self.file.io.read(self.size - 4),
+                bufsize=decompressed_size,
+            )
+
+        return self.file.io.read(self.size)
+
+    def fields(
+        self, only: Collection[bytes] | None = None
+    ) -> Iterator["Field"]:
+        """
+        Iterates over the fields in the record.
+
+        :param only: If given, only the first field of each of these types is
+                     returned. Other fields are skipped by size without their
+                     data being read, and iteration stops as soon as every
+                     requested type has been found. The file is left at the
+                     end of the record either way, as when every field is
+                     read.
+        """
+        if only is not None:
+            if self.flags & RecordFlag.Compressed:
+                yield from self._inflated_fields(set(only))
+            else:
+                yield from self._projected_fields(set(only))
+            self.file.io.seek(self.loc.end)
+            return
+
         self.file.io.seek(self.loc.start + 24)
         if self.flags & RecordFlag.Compressed:
             decompressed_size = self.file.io.uint32()
@@ -130,6 +168,74 @@ class Record:
                 field = self.file.parse_field()
                 yield field
 
+    def _projected_fields(self, remaining: set[bytes]) -> Iterator["Field"]:
+        io = self.file.io
+        pos = self.loc.start + 24
+        while remaining and pos < self.loc.end:
+            io.seek(pos)
+            type_, size = FIELD_HEADER.unpack(io.read(6))
+            pos += 6
+            if type_ == b"XXXX":
+                header = io.read(10)
+                (size,) = XXXX_SIZE.unpack_from(header)
+                type_, _ = FIELD_HEADER.unpack_from(header, 4)
+                pos += 10
+
+            if type_ in remaining:
+                remaining.discard(type_)
+                yield Field(
+                    type=type_,
+                    size=size,
+                    file=self.file,
+                    data=io.read(size) if size else b"",
+                )
+
+            pos += size
+
+    def _inflated_fields(self, remaining: set[bytes]) -> Iterator["Field"]:
+        self.file.io.seek(self.loc.start + 28)
+        pending = self.file.io.read(self.size - 4)
+        decompressor = zlib.decompressobj()
+        body = bytearray()
+
+        def fill(size: int) -> bool:
+            # Only decompress as much of the record as we've needed so far,
+            # so we can stop once every field has been found.
+            nonlocal pending
+            while len(body) < size and not decompressor.eof:
+                if not pending:
+                    body.extend(decompressor.flush())
+                    break
+                body.extend(
+                    decompressor.decompress(
+                        pending, max(size - len(body), 16384)
+                    )
+                )
+                pending = decompressor.unconsumed_tail
+            return len(body) >= size
+
+        pos = 0
+        while remaining and fill(pos + 6):
+            type_, size = FIELD_HEADER.unpack_from(body, pos)
+            pos += 6
+            if type_ == b"XXXX":
+                fill(pos + 10)
+                (size,) = XXXX_SIZE.unpack_from(body, pos)
+                type_, _ = FIELD_HEADER.unpack_from(body, pos + 4)
+                pos += 10
+
+            if type_ in remaining:
+                remaining.discard(type_)
+                fill(pos + size)
+                yield Field(
+                    type=type_,
+                    size=size,
+                    file=self.file,
+                    data=bytes(body[pos : pos + size]),
+                )
+
+            pos += size
+
 
 @dataclasses.dataclass
 class Field:
@@ -139,6 +245,38 @@ class Field:
     data: bytes
 
 
+# Fixed 24-byte headers shared by every GRUP and record, used when walking the
+# entire file where the overhead of a Capture per header adds up.
+GROUP_HEADER = struct.Struct("<4sI4sIHHHH")
+RECORD_HEADER = struct.Struct("<4sIIIIHH")
+FIELD_HEADER = struct.Struct("<4sH")
+XXXX_SIZE = struct.Struct("<I")
+
+
+def field_headers(
+    data: bytes | memoryview,
+) -> Iterator[tuple[bytes, int, int]]:
+    """
+    Walks the fields in a record body without copying any field data.
+
+    :param data: The (decompressed) body of a record.
+    :return: An iterator of (type, start of the field data, size of the field
+             data) tuples.
+    """
+    pos = 0
+    end = len(data)
+    while pos < end:
+        type_, size = FIELD_HEADER.unpack_from(data, pos)
+        pos += 6
+        if type_ == b"XXXX":
+            # See parse_field, the real size of the next field follows.
+            (size,) = XXXX_SIZE.unpack_from(data, pos)
+            type_, _ = FIELD_HEADER.unpack_from(data, pos + 4)
+            pos += 10
+        yield type_, pos, size
+        pos += size
+
+
 class ESMContainer:
     """
     Parser for a Bethesda ESM file.
@@ -254,6 +392,106 @@ class ESMContainer:
                 file=self,
             )
 
+    @property
+    def masters(self) -> list[str]:
+        """
+        The filenames of the masters this file depends on, in the order used
+        by the top byte of its form IDs.
+        """
+        self.io.seek(self.header["loc"].start)
+        return [
+            field.data.rstrip(b"\x00").decode("utf-8")
+            for field in self.parse_record().fields()
+            if field.type == b"MAST"
+        ]
+
+    def walk(self) -> Iterator[Group | Record]:
+        """
+        Walks every group and record in the file in file order.
+
+        Groups are yielded before their children. The walk keeps track of its
+        own position, so it's safe to read from :attr:`io` (for example using
+        :meth:`Record.fields`) between items.
+        """
+        pos = self.header["loc"].end
+        while True:
+            self.io.seek(pos)
+            try:
+                header = self.io.read(24)
+            except EOFError:
+                return
+
+            if len(header) < 24:
+                return
+
+            if header[:4] == b"GRUP":
+                (
+                    type_,
+                    size,
+                    label,
+                    group_type,
+                    _,
+                    _,
+                    version,
+                    _,
+                ) = GROUP_HEADER.unpack(header)
+                yield Group(
+                    type=type_,
+                    size=size,
+                    label=label,
+                    group_type=group_type,
+                    version=version,
+                    loc=Location(pos, pos + size),
+                    file=self,
+                )
+                # Descend into the group's children.
+                pos += 24
+            else:
+                (
+                    type_,
+                    size,
+                    flags,
+                    form_id,
+                    revision,
+                    version,
+                    _,
+                ) = RECORD_HEADER.unpack(header)
+                record = Record(
+                    type=type_,
+                    size=size,
+                    flags=RecordFlag(flags),
+                    form_id=form_id,
+                    revision=revision,
+                    version=version,
+                    loc=Location(pos, pos + size + 24),
+                    file=self,
+                )
+                yield record
+                pos = record.loc.end
+
+    def project(
+        self,
+        only: Collection[bytes],
+        *,
+        types: Collection[bytes] | None = None,
+    ) -> Iterator[tuple[Record, dict[bytes, Field]]]:
+        """
+        Walks every record in the file, reading only the requested fields.
+
+        :param only: The field types to read from each record. Only the first
+                     field of each type is read.
+        :param types: If given, only records of these types are returned.
+        :return: An iterator of (record, fields by type) tuples.
+        """
+        for item in self.walk():
+            if isinstance(item, Group):
+                continue
+
+            if types is not None and item.type not in types:
+                continue
+
+            yield item, {field.type: field for field in item.fields(only)}
+
     @property
     def groups(self):
         return self._groups
@@ -0,0 +1,373 @@
+"""
+Columnar indexes over the records in an ESM file.
+"""
+import abc
+from array import array
+from collections import defaultdict
+from typing import Iterable
+
+from starhopper.formats.common import (
+    FileIdentity,
+    read_columns,
+    sidecar_path,
+    write_columns,
+)
+from starhopper.formats.esm.file import (
+    ESMContainer,
+    Group,
+    Record,
+    field_headers,
+)
+
+#: Suffix of the index cache stored alongside an ESM file.
+INDEX_SUFFIX = ".shidx"
+INDEX_MAGIC = b"SHIX"
+
+
+class IndexPass(abc.ABC):
+    """
+    An optional pass that runs while an :class:`ESMIndex` is being built,
+    contributing its own columns to the index and its cache.
+
+    Every pass sees every group and record in file order, so any number of
+    passes can share a single walk of the file.
+    """
+
+    #: Unique name of the pass, used to prefix its columns.
+    name: str
+
+    def enter_group(self, group: Group):
+        pass
+
+    def leave_group(self, group: Group):
+        pass
+
+    @abc.abstractmethod
+    def visit(self, row: int, record: Record):
+        """
+        Called for every record in the file.
+
+        :param row: The row of the record in the index.
+        :param record: The record itself.
+        """
+
+    @abc.abstractmethod
+    def columns(self) -> dict[str, array | bytes]:
+        """
+        Returns the columns built by this pass, once every record has been
+        visited.
+        """
+
+
+class ESMIndex:
+    """
+    A table of every record in an ESM file, stored as parallel columns with
+    one row per record in file order.
+
+    Lookups by form ID and by record type are built lazily on first use.
+    """
+
+    def __init__(self, columns: dict[str, array | bytes]):
+        self.columns = columns
+        self.offsets: array = columns["record.offsets"]
+        self.form_ids: array = columns["record.form_ids"]
+        #: The record type, as a little-endian integer.
+        self.types: array = columns["record.types"]
+        self.flags: array = columns["record.flags"]
+
+        self._by_form_id: dict[int, int] | None = None
+        self._by_type: dict[int, array] | None = None
+        self._by_editor_id: dict[str, list[int]] | None = None
+        self._field_ids: dict[bytes, int] | None = None
+        self._by_field: dict[int, array] | None = None
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def has_pass(self, name: str) -> bool:
+        """
+        Returns True if the columns of the given pass are in this index.
+        """
+        prefix = f"{name}."
+        return any(column.startswith(prefix) for column in self.columns)
+
+    def find(self, form_id: int) -> int | None:
+        """
+        Returns the row of the record with the given form ID, if any.
+        """
+        if self._by_form_id is None:
+            self._by_form_id = {
+                form_id: row for row, form_id in enumerate(self.form_ids)
+            }
+        return self._by_form_id.get(form_id)
+
+    def rows(self, type_: bytes) -> array:
+        """
+        Returns the rows of every record of the given type, in file order.
+        """
+        if self._by_type is None:
+            by_type = defaultdict(lambda: array("I"))
+            for row, t in enumerate(self.types):
+                by_type[t].append(row)
+            self._by_type = dict(by_type)
+        return self._by_type.get(int.from_bytes(type_, "little"), array("I"))
+
+    def editor_id(self, row: int) -> str | None:
+        """
+        Returns the editor ID of the record at the given row, if it has one.
+
+        Requires the :class:`EditorIDPass` columns.
+        """
+        offsets = self.columns["edid.offsets"]
+        start, end = offsets[row], offsets[row + 1]
+        if start == end:
+            return None
+        return self.columns["edid.data"][start:end].decode("utf-8", "replace")
+
+    def find_editor_id(self, editor_id: str) -> list[int]:
+        """
+        Returns the rows of every record with the given editor ID, ignoring
+        case.
+
+        Requires the :class:`EditorIDPass` columns.
+        """
+        if self._by_editor_id is None:
+            by_editor_id = defaultdict(list)
+            for row in range(len(self)):
+                name = self.editor_id(row)
+                if name is not None:
+                    by_editor_id[name.lower()].append(row)
+            self._by_editor_id = dict(by_editor_id)
+        return self._by_editor_id.get(editor_id.lower(), [])
+
+    def _field_id(self, type_: bytes) -> int | None:
+        if self._field_ids is None:
+            types = self.columns["fields.types"]
+            self._field_ids = {
+                types[i : i + 4]: i // 4 for i in range(0, len(types), 4)
+            }
+        return self._field_ids.get(type_)
+
+    def field_types(self, row: int) -> list[bytes]:
+        """
+        Returns the distinct field types in the record at the given row.
+
+        Requires the :class:`FieldTypePass` columns.
+        """
+        types = self.columns["fields.types"]
+        offsets = self.columns["fields.offsets"]
+        ids = self.columns["fields.ids"]
+        return [
+            types[i * 4 : i * 4 + 4]
+            for i in ids[offsets[row] : offsets[row + 1]]
+        ]
+
+    def has_field(self, row: int, type_: bytes) -> bool:
+        """
+        Returns True if the record at the given row contains a field of the
+        given type.
+
+        Requires the :class:`FieldTypePass` columns.
+        """
+        field_id = self._field_id(type_)
+        if field_id is None:
+            return False
+        offsets = self.columns["fields.offsets"]
+        ids = self.columns["fields.ids"]
+        return field_id in ids[offsets[row] : offsets[row + 1]]
+
+    def rows_with_field(self, type_: bytes) -> array:
+        """
+        Returns the rows of every record containing a field of the given type,
+        in file order.
+
+        Requires the :class:`FieldTypePass` columns.
+        """
+        if self._by_field is None:
+            offsets = self.columns["fields.offsets"]
+            ids = self.columns["fields.ids"]
+            by_field = defaultdict(lambda: array("I"))
+            for row in range(len(self)):
+                for field_id in ids[offsets[row] : offsets[row + 1]]:
+                    by_field[field_id].append(row)
+            self._by_field = dict(by_field)
+
+        field_id = self._field_id(type_)
+        if field_id is None:
+            return array("I")
+        return self._by_field.get(field_id, array("I"))
+
+    def record(self, esm: ESMContainer, row: int) -> Record:
+        """
+        Reads the record at the given row from the file it was built from.
+        """
+        esm.io.seek(self.offsets[row])
+        return esm.parse_record()
+
+    @staticmethod
+    def _walk(
+        esm: ESMContainer, passes: Iterable[IndexPass], *, core: bool = True
+    ) -> dict[str, array | bytes]:
+        passes = list(passes)
+        offsets = array("Q")
+        form_ids = array("I")
+        types = array("I")
+        flags = array("I")
+
+        # Open groups, as (group, end offset).
+        stack: list[tuple[Group, int]] = []
+        row = 0
+        for item in esm.walk():
+            while stack and item.loc.start >= stack[-1][1]:
+                group, _ = stack.pop()
+                for pass_ in passes:
+                    pass_.leave_group(group)
+
+            if isinstance(item, Group):
+                stack.append((item, item.loc.end))
+                for pass_ in passes:
+                    pass_.enter_group(item)
+                continue
+
+            if core:
+                offsets.append(item.loc.start)
+                form_ids.append(item.form_id)
+                types.append(int.from_bytes(item.type, "little"))
+                flags.append(item.flags)
+
+            for pass_ in passes:
+                pass_.visit(row, item)
+            row += 1
+
+        while stack:
+            group, _ = stack.pop()
+            for pass_ in passes:
+                pass_.leave_group(group)
+
+        columns = {}
+        if core:
+            columns.update(
+                {
+                    "record.offsets": offsets,
+                    "record.form_ids": form_ids,
+                    "record.types": types,
+                    "record.flags": flags,
+                }
+            )
+
+        for pass_ in passes:
+            for name, column in pass_.columns().items():
+                columns[f"{pass_.name}.{name}"] = column
+
+        return columns
+
+    @classmethod
+    def build(
+        cls, esm: ESMContainer, passes: Iterable[IndexPass] = ()
+    ) -> "ESMIndex":
+        """
+        Builds a new index by walking every record in the file.
+
+        :param esm: The ESM file to index.
+        :param passes: Optional passes to run during the walk.
+        """
+        return cls(cls._walk(esm, passes))
+
+    @classmethod
+    def from_container(
+        cls,
+        esm: ESMContainer,
+        passes: Iterable[type[IndexPass]] = (),
+        *,
+        cache: bool = True,
+    ) -> "ESMIndex":
+        """
+        Returns the index for an open ESM file, using the cache stored
+        alongside the file when it's still valid.
+
+        If the cache is valid but is missing the columns of one of the
+        requested passes, only those passes are run and the cache is updated.
+
+        :param esm: The ESM file to index.
+        :param passes: The optional passes that must be included.
+        :param cache: Whether to read and write the on-disk cache. Files that
+                      aren't on disk are never cached.
+        """
+        cache_path = sidecar_path(esm.file, INDEX_SUFFIX)
+        if not cache or cache_path is None:
+            return cls.build(esm, [pass_() for pass_ in passes])
+
+        identity = FileIdentity.of(esm.file.name)
+        columns = read_columns(cache_path, INDEX_MAGIC, identity)
+        if columns is None:
+            columns = cls._walk(esm, [pass_() for pass_ in passes])
+        else:
+            index = cls(columns)
+            missing = [p() for p in passes if not index.has_pass(p.name)]
+            if not missing:
+                return index
+            columns.update(cls._walk(esm, missing, core=False))
+
+        try:
+            write_columns(cache_path, INDEX_MAGIC, identity, columns)
+        except OSError:
+            # Game installs are often read-only, which just means we'll be
+            # building the index again next time.
+            pass
+
+        return cls(columns)
+
+
+class EditorIDPass(IndexPass):
+    """
+    Collects the editor ID (EDID) of every record.
+
+    Editor IDs are stored back to back in a single blob, with the start of
+    each row's editor ID in a separate offsets column.
+    """
+
+    name = "edid"
+
+    def __init__(self):
+        self.data = bytearray()
+        self.offsets = array("I", [0])
+
+    def visit(self, row: int, record: Record):
+        for field in record.fields(only={b"EDID"}):
+            self.data += field.data.rstrip(b"\x00")
+        self.offsets.append(len(self.data))
+
+    def columns(self) -> dict[str, array | bytes]:
+        return {"data": bytes(self.data), "offsets": self.offsets}
+
+
+class FieldTypePass(IndexPass):
+    """
+    Collects the distinct field types contained in every record, so that
+    field-presence filters never need to read a record body.
+
+    Each distinct field type in the file is given a small ID, and each row
+    stores the sorted IDs of its field types back to back in a single column.
+    """
+
+    name = "fields"
+
+    def __init__(self):
+        self.field_ids: dict[bytes, int] = {}
+        self.ids = array("H")
+        self.offsets = array("I", [0])
+
+    def visit(self, row: int, record: Record):
+        present = {
+            self.field_ids.setdefault(type_, len(self.field_ids))
+            for type_, _, _ in field_headers(record.body())
+        }
+        self.ids.extend(sorted(present))
+        self.offsets.append(len(self.ids))
+
+    def columns(self) -> dict[str, array | bytes]:
+        return {
+            "types": b"".join(self.field_ids),
+            "offsets": self.offsets,
+            "ids": self.ids,
+        }
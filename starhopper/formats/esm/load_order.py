@@ -0,0 +1,188 @@
+"""
+Overlays several plugins into a single view of the game's records.
+"""
+import contextlib
+import dataclasses
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterable
+
+from starhopper.formats.esm.file import ESMContainer, Record
+from starhopper.formats.esm.index import ESMIndex
+
+
+# Plugins compare by identity, so that an Override can be hashed.
+@dataclasses.dataclass(eq=False)
+class Plugin:
+    path: Path
+    esm: ESMContainer
+    index: ESMIndex
+    #: The load order position of each of this plugin's masters, followed by
+    #: the plugin itself. Indexed by the top byte of a form ID.
+    mapping: list[int]
+
+    def resolve(self, form_id: int) -> int:
+        """
+        Converts a form ID local to this plugin into a load order form ID.
+        """
+        master = min(form_id >> 24, len(self.mapping) - 1)
+        return (self.mapping[master] << 24) | (form_id & 0xFFFFFF)
+
+
+@dataclasses.dataclass(frozen=True)
+class Override:
+    plugin: Plugin
+    #: The row of the record in the plugin's index.
+    row: int
+
+    @property
+    def offset(self) -> int:
+        return self.plugin.index.offsets[self.row]
+
+    def record(self) -> Record:
+        return self.plugin.index.record(self.plugin.esm, self.row)
+
+
+def _open_plugin(path: Path, cache: bool) -> tuple[ESMContainer, ESMIndex]:
+    handle = open(path, "rb")
+    try:
+        esm = ESMContainer(handle)
+        return esm, ESMIndex.from_container(esm, cache=cache)
+    except BaseException:
+        handle.close()
+        raise
+
+
+class LoadOrder:
+    """
+    A set of plugins loaded on top of each other.
+
+    Form IDs used by this class are in load order space, where the top byte
+    is the position of the plugin that defined the record, rather than the
+    position of the master in the referencing plugin's master list.
+
+    .. note::
+
+        Light and medium plugins, which share a single load order slot, are
+        not yet supported.
+    """
+
+    def __init__(
+        self,
+        paths: Iterable[Path | str],
+        *,
+        workers: int | None = None,
+        cache: bool = True,
+    ):
+        """
+        Opens and indexes every plugin in parallel.
+
+        :param paths: The plugins to load, in load order.
+        :param workers: The number of plugins to open at once.
+        :param cache: Whether to use the index cached alongside each plugin.
+        """
+        paths = [Path(path) for path in paths]
+        with ThreadPoolExecutor(workers) as pool:
+            futures = [pool.submit(_open_plugin, p, cache) for p in paths]
+
+        self.plugins: list[Plugin] = []
+        # Close every plugin that did open if any of them fails to.
+        with contextlib.ExitStack() as stack:
+            for future in futures:
+                if future.exception() is None:
+                    stack.callback(future.result()[0].file.close)
+
+            positions: dict[str, int] = {}
+            for position, (path, future) in enumerate(zip(paths, futures)):
+                esm, index = future.result()
+                mapping = []
+                for master in esm.masters:
+                    try:
+                        mapping.append(positions[master.lower()])
+                    except KeyError:
+                        raise ValueError(
+                            f"{path.name} requires {master}, which must be"
+                            f" loaded before it"
+                        ) from None
+
+                mapping.append(position)
+                positions[path.name.lower()] = position
+                self.plugins.append(Plugin(path, esm, index, mapping))
+
+            stack.pop_all()
+
+        # Both maps store (plugin position << 32 | row) to keep millions of
+        # entries cheap. Only records that are overridden at least once have
+        # an entry in _chains.
+        self._winners: dict[int, int] = {}
+        self._chains: dict[int, list[int]] = {}
+        for position, plugin in enumerate(self.plugins):
+            for row, form_id in enumerate(plugin.index.form_ids):
+                form_id = plugin.resolve(form_id)
+                entry = (position << 32) | row
+
+                previous = self._winners.get(form_id)
+                if previous is not None:
+                    chain = self._chains.get(form_id)
+                    if chain is None:
+                        self._chains[form_id] = chain = [previous]
+                    chain.append(entry)
+
+                self._winners[form_id] = entry
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return len(self._winners)
+
+    def __contains__(self, form_id: int):
+        return form_id in self._winners
+
+    def close(self):
+        for plugin in self.plugins:
+            plugin.esm.file.close()
+
+    def _override(self, entry: int) -> Override:
+        return Override(self.plugins[entry >> 32], entry & 0xFFFFFFFF)
+
+    def winner(self, form_id: int) -> Override | None:
+        """
+        Returns the winning override of a record, if it exists.
+
+        :param form_id: A load order form ID.
+        """
+        entry = self._winners.get(form_id)
+        if entry is None:
+            return None
+        return self._override(entry)
+
+    def overrides(self, form_id: int) -> list[Override]:
+        """
+        Returns every version of a record, from the plugin that defined it to
+        the winning override.
+
+        :param form_id: A load order form ID.
+        """
+        chain = self._chains.get(form_id)
+        if chain is not None:
+            return [self._override(entry) for entry in chain]
+
+        entry = self._winners.get(form_id)
+        if entry is None:
+            return []
+        return [self._override(entry)]
+
+    def record(self, form_id: int) -> Record | None:
+        """
+        Reads the winning version of a record.
+
+        :param form_id: A load order form ID.
+        """
+        override = self.winner(form_id)
+        if override is None:
+            return None
+        return override.record()
@@ -0,0 +1,528 @@
+"""
+A small query language over the records in an ESM file.
+
+Queries look like::
+
+    type = NPC_ and flags & Deleted = 0 and has_field(FULL)
+    and edid like "Ship%"
+
+Supported predicates are:
+
+- ``type = NPC_`` and ``type != NPC_``
+- ``form_id = 0x0001234``, as well as ``!=``, ``<``, ``<=``, ``>``, ``>=``
+- ``edid = "Name"``, ``edid != "Name"`` and ``edid like "Ship%"``. Editor IDs
+  are compared ignoring case, and ``like`` uses ``%`` and ``_`` wildcards.
+- ``flags = 0x20`` or ``flags & Deleted | Persistent = 0``, with the same
+  operators as ``form_id``. Flags can be given by their :class:`RecordFlag`
+  name.
+- ``has_field(FULL)``
+
+Predicates can be combined using ``and``, ``or``, ``not`` and parentheses.
+
+Queries are planned against an :class:`ESMIndex`, so any predicate that can be
+answered from the index never touches the file. Record bodies are only read
+for the rows that survive every index predicate, in file order. ``has_field``
+is answered by the :class:`FieldTypePass` columns when they're in the index,
+and by reading the bodies of the remaining rows otherwise. The pass has to read
+every record in the file, so it's only built when asked for, after which it's
+cached alongside the file and every later ``has_field`` is answered from it.
+"""
+import abc
+import operator
+import re
+from typing import Callable, Iterable, Iterator
+
+from starhopper.formats.esm.file import (
+    ESMContainer,
+    Record,
+    RecordFlag,
+    field_headers,
+)
+from starhopper.formats.esm.index import (
+    EditorIDPass,
+    ESMIndex,
+    FieldTypePass,
+    IndexPass,
+)
+
+_TOKENS = re.compile(
+    r"""
+    \s*(?:
+        (?P<number>0[xX][0-9a-fA-F]+|\d+)
+        |(?P<string>"[^"]*"|'[^']*')
+        |(?P<op><=|>=|!=|=|<|>|&|\||\(|\))
+        |(?P<name>[A-Za-z_][A-Za-z0-9_]*)
+    )
+    """,
+    re.VERBOSE,
+)
+
+
+def _number(token: str) -> int:
+    # Decimal numbers may have leading zeros, which int(token, 0) rejects.
+    if token[:2] in ("0x", "0X"):
+        return int(token[2:], 16)
+    return int(token, 10)
+
+
+_COMPARISONS: dict[str, Callable[[object, object], bool]] = {
+    "=": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+
+class QueryContext:
+    """
+    The state shared by every predicate while a query is running.
+    """
+
+    def __init__(self, esm: ESMContainer, index: ESMIndex):
+        self.esm = esm
+        self.index = index
+        self._row: int | None = None
+        self._record: Record | None = None
+        self._field_types: set[bytes] | None = None
+
+    def record(self, row: int) -> Record:
+        if self._row != row:
+            self._row = row
+            self._record = self.index.record(self.esm, row)
+            self._field_types = None
+        return self._record
+
+    def field_types(self, row: int) -> set[bytes]:
+        record = self.record(row)
+        if self._field_types is None:
+            self._field_types = {
+                type_ for type_, _, _ in field_headers(record.body())
+            }
+        return self._field_types
+
+
+class Predicate(abc.ABC):
+    #: Rough order in which predicates should be evaluated, cheapest and
+    #: most selective first.
+    cost: int = 0
+    #: Index passes needed to evaluate this predicate.
+    passes: tuple[type[IndexPass], ...] = ()
+
+    def required_passes(self) -> set[type[IndexPass]]:
+        return set(self.passes)
+
+    def needs_body(self, index: ESMIndex) -> bool:
+        """
+        Returns True if this predicate must read record bodies when run
+        against the given index.
+        """
+        return False
+
+    def candidates(
+        self, ctx: QueryContext, within: list[int] | None
+    ) -> list[int] | None:
+        """
+        Narrows down the rows that could match this predicate using only the
+        index.
+
+        The result is exact for predicates that don't need record bodies.
+
+        :param ctx: The running query.
+        :param within: The rows still under consideration, in file order, or
+                       None for every row.
+        :return: The remaining rows in file order, or None for every row.
+        """
+        if self.needs_body(ctx.index):
+            return within
+        rows = range(len(ctx.index)) if within is None else within
+        return [row for row in rows if self.matches(ctx, row)]
+
+    @abc.abstractmethod
+    def matches(self, ctx: QueryContext, row: int) -> bool:
+        pass
+
+
+class And(Predicate):
+    def __init__(self, children: list[Predicate]):
+        self.children = sorted(children, key=lambda c: c.cost)
+        self.cost = max(c.cost for c in children)
+
+    def required_passes(self):
+        return set().union(*(c.required_passes() for c in self.children))
+
+    def needs_body(self, index):
+        return any(c.needs_body(index) for c in self.children)
+
+    def candidates(self, ctx, within):
+        # Each predicate only has to look at the survivors of the ones
+        # before it.
+        for child in self.children:
+            within = child.candidates(ctx, within)
+        return within
+
+    def matches(self, ctx, row):
+        return all(child.matches(ctx, row) for child in self.children)
+
+
+class Or(Predicate):
+    def __init__(self, children: list[Predicate]):
+        self.children = sorted(children, key=lambda c: c.cost)
+        self.cost = max(c.cost for c in children)
+
+    def required_passes(self):
+        return set().union(*(c.required_passes() for c in self.children))
+
+    def needs_body(self, index):
+        return any(c.needs_body(index) for c in self.children)
+
+    def candidates(self, ctx, within):
+        result = set()
+        for child in self.children:
+            rows = child.candidates(ctx, within)
+            if rows is None:
+                return None
+            result.update(rows)
+        return sorted(result)
+
+    def matches(self, ctx, row):
+        return any(child.matches(ctx, row) for child in self.children)
+
+
+class Not(Predicate):
+    def __init__(self, child: Predicate):
+        self.child = child
+        self.cost = child.cost
+
+    def required_passes(self):
+        return self.child.required_passes()
+
+    def needs_body(self, index):
+        return self.child.needs_body(index)
+
+    def candidates(self, ctx, within):
+        if self.needs_body(ctx.index):
+            return within
+        excluded = set(self.child.candidates(ctx, within))
+        rows = range(len(ctx.index)) if within is None else within
+        return [row for row in rows if row not in excluded]
+
+    def matches(self, ctx, row):
+        return not self.child.matches(ctx, row)
+
+
+class TypeIs(Predicate):
+    cost = 1
+
+    def __init__(self, type_: bytes, op: str):
+        self.type_ = type_
+        self.op = op
+
+    def candidates(self, ctx, within):
+        if self.op == "=" and within is None:
+            return list(ctx.index.rows(self.type_))
+        return super().candidates(ctx, within)
+
+    def matches(self, ctx, row):
+        matched = ctx.index.types[row] == int.from_bytes(self.type_, "little")
+        return matched if self.op == "=" else not matched
+
+
+class FormIDIs(Predicate):
+    cost = 0
+
+    def __init__(self, form_id: int, op: str):
+        self.form_id = form_id
+        self.op = op
+
+    def candidates(self, ctx, within):
+        if self.op == "=" and within is None:
+            row = ctx.index.find(self.form_id)
+            return [] if row is None else [row]
+        return super().candidates(ctx, within)
+
+    def matches(self, ctx, row):
+        return _COMPARISONS[self.op](ctx.index.form_ids[row], self.form_id)
+
+
+class FlagsAre(Predicate):
+    cost = 3
+
+    def __init__(self, mask: int | None, op: str, value: int):
+        self.mask = mask
+        self.op = op
+        self.value = value
+
+    def matches(self, ctx, row):
+        flags = ctx.index.flags[row]
+        if self.mask is not None:
+            flags &= self.mask
+        return _COMPARISONS[self.op](flags, self.value)
+
+
+class EditorIDIs(Predicate):
+    cost = 1
+    passes = (EditorIDPass,)
+
+    def __init__(self, editor_id: str, op: str):
+        self.editor_id = editor_id.lower()
+        self.op = op
+
+    def candidates(self, ctx, within):
+        if self.op == "=" and within is None:
+            return ctx.index.find_editor_id(self.editor_id)
+        return super().candidates(ctx, within)
+
+    def matches(self, ctx, row):
+        editor_id = ctx.index.editor_id(row)
+        matched = editor_id is not None and editor_id.lower() == self.editor_id
+        return matched if self.op == "=" else not matched
+
+
+class EditorIDLike(Predicate):
+    cost = 2
+    passes = (EditorIDPass,)
+
+    def __init__(self, pattern: str):
+        self.pattern = re.compile(
+            "".join(
+                ".*" if c == "%" else "." if c == "_" else re.escape(c)
+                for c in pattern
+            ),
+            re.IGNORECASE | re.DOTALL,
+        )
+
+    def matches(self, ctx, row):
+        editor_id = ctx.index.editor_id(row)
+        return editor_id is not None and bool(self.pattern.fullmatch(editor_id))
+
+
+class HasField(Predicate):
+    # FieldTypePass isn't required, as running it means reading every
+    # record, while reading bodies only touches the rows that are left.
+    cost = 4
+
+    def __init__(self, type_: bytes):
+        self.type_ = type_
+
+    def needs_body(self, index):
+        # Without the field type columns, we have to look at every field.
+        return not index.has_pass(FieldTypePass.name)
+
+    def candidates(self, ctx, within):
+        if self.needs_body(ctx.index):
+            return within
+        if within is None:
+            return list(ctx.index.rows_with_field(self.type_))
+        return super().candidates(ctx, within)
+
+    def matches(self, ctx, row):
+        if self.needs_body(ctx.index):
+            return self.type_ in ctx.field_types(row)
+        return ctx.index.has_field(row, self.type_)
+
+
+class _Parser:
+    def __init__(self, text: str):
+        self.tokens: list[tuple[str, str]] = []
+        pos = 0
+        text = text.rstrip()
+        while pos < len(text):
+            match = _TOKENS.match(text, pos)
+            if match is None or match.end() == pos:
+                raise ValueError(f"Unexpected input at {pos}: {text[pos:]!r}")
+            self.tokens.append((match.lastgroup, match.group(match.lastgroup)))
+            pos = match.end()
+        self.pos = 0
+
+    def peek(self) -> tuple[str | None, str | None]:
+        if self.pos < len(self.tokens):
+            return self.tokens[self.pos]
+        return None, None
+
+    def next(self) -> tuple[str, str]:
+        if self.pos >= len(self.tokens):
+            raise ValueError("Unexpected end of query")
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def keyword(self, word: str) -> bool:
+        kind, value = self.peek()
+        if kind == "name" and value.lower() == word:
+            self.pos += 1
+            return True
+        return False
+
+    def expect(self, value: str):
+        kind, found = self.next()
+        if found != value:
+            raise ValueError(f"Expected {value!r}, got {found!r}")
+
+    def parse(self) -> Predicate:
+        predicate = self.or_()
+        if self.pos != len(self.tokens):
+            raise ValueError(f"Unexpected {self.tokens[self.pos][1]!r}")
+        return predicate
+
+    def or_(self) -> Predicate:
+        children = [self.and_()]
+        while self.keyword("or"):
+            children.append(self.and_())
+        return children[0] if len(children) == 1 else Or(children)
+
+    def and_(self) -> Predicate:
+        children = [self.not_()]
+        while self.keyword("and"):
+            children.append(self.not_())
+        return children[0] if len(children) == 1 else And(children)
+
+    def not_(self) -> Predicate:
+        if self.keyword("not"):
+            return Not(self.not_())
+        return self.atom()
+
+    def atom(self) -> Predicate:
+        if self.peek() == ("op", "("):
+            self.next()
+            predicate = self.or_()
+            self.expect(")")
+            return predicate
+
+        kind, name = self.next()
+        if kind != "name":
+            raise ValueError(f"Expected a predicate, got {name!r}")
+
+        match name.lower():
+            case "has_field":
+                self.expect("(")
+                type_ = self.type_()
+                self.expect(")")
+                return HasField(type_)
+            case "type":
+                op = self.operator(("=", "!="))
+                return TypeIs(self.type_(), op)
+            case "form_id":
+                op = self.operator()
+                return FormIDIs(self.number(), op)
+            case "edid":
+                if self.keyword("like"):
+                    return EditorIDLike(self.string())
+                op = self.operator(("=", "!="))
+                return EditorIDIs(self.string(), op)
+            case "flags":
+                mask = None
+                if self.peek() == ("op", "&"):
+                    self.next()
+                    mask = self.flags()
+                op = self.operator()
+                return FlagsAre(mask, op, self.flags())
+            case _:
+                raise ValueError(f"Unknown predicate {name!r}")
+
+    def operator(self, allowed: Iterable[str] = tuple(_COMPARISONS)) -> str:
+        kind, op = self.next()
+        if kind != "op" or op not in allowed:
+            raise ValueError(
+                f"Expected one of {', '.join(allowed)}, got {op!r}"
+            )
+        return op
+
+    def string(self) -> str:
+        kind, value = self.next()
+        if kind == "string":
+            return value[1:-1]
+        if kind == "name":
+            return value
+        raise ValueError(f"Expected a string, got {value!r}")
+
+    def number(self) -> int:
+        kind, value = self.next()
+        if kind != "number":
+            raise ValueError(f"Expected a number, got {value!r}")
+        return _number(value)
+
+    def type_(self) -> bytes:
+        type_ = self.string().encode("ascii")
+        if len(type_) != 4:
+            raise ValueError(f"Record types are 4 characters, got {type_!r}")
+        return type_
+
+    def flags(self) -> int:
+        value = 0
+        while True:
+            if self.peek() == ("op", "("):
+                self.next()
+                value |= self.flags()
+                self.expect(")")
+            else:
+                kind, token = self.next()
+                if kind == "number":
+                    value |= _number(token)
+                elif kind == "name" and token in RecordFlag.__members__:
+                    value |= RecordFlag[token]
+                else:
+                    raise ValueError(f"Expected a flag, got {token!r}")
+
+            if self.peek() != ("op", "|"):
+                return value
+            self.next()
+
+
+class Query:
+    """
+    A parsed query, which can be run against any number of files.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.predicate = _Parser(text).parse()
+
+    def __repr__(self):
+        return f"<Query({self.text!r})>"
+
+    def rows(self, esm: ESMContainer, index: ESMIndex) -> Iterator[int]:
+        """
+        Yields the index rows of every matching record, in file order.
+
+        :param esm: The file to query.
+        :param index: An index of the file containing every pass needed by
+                      the query.
+        """
+        ctx = QueryContext(esm, index)
+
+        candidates = self.predicate.candidates(ctx, None)
+        if candidates is None:
+            candidates = range(len(index))
+
+        if not self.predicate.needs_body(index):
+            yield from candidates
+            return
+
+        # Rows are in file order, so bodies are read sequentially.
+        for row in candidates:
+            if self.predicate.matches(ctx, row):
+                yield row
+
+    def execute(
+        self,
+        esm: ESMContainer,
+        *,
+        cache: bool = True,
+        passes: Iterable[type[IndexPass]] = (),
+    ) -> Iterator[Record]:
+        """
+        Yields every matching record, in file order.
+
+        :param esm: The file to query.
+        :param cache: Whether to use the index cached alongside the file.
+        :param passes: Extra passes to include in the index, such as
+                       :class:`FieldTypePass` so that ``has_field`` never
+                       reads record bodies.
+        """
+        index = ESMIndex.from_container(
+            esm, self.predicate.required_passes() | set(passes), cache=cache
+        )
+        for row in self.rows(esm, index):
+            yield index.record(esm, row)
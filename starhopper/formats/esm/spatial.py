@@ -0,0 +1,224 @@
+"""
+Spatial lookups over the exterior cells and placed references of worldspaces.
+"""
+import math
+import struct
+from array import array
+from collections import defaultdict
+
+from starhopper.formats.esm.file import ESMContainer, Group, GroupType, Record
+from starhopper.formats.esm.index import ESMIndex, IndexPass
+
+#: The width of an exterior cell, in worldspace units.
+CELL_SIZE = 4096.0
+#: log2 of the width of an exterior sub-block, in cells.
+SUB_BLOCK_SHIFT = 3
+
+#: Record types that are placed in the world with a position and rotation.
+PLACED_TYPES = frozenset((b"REFR", b"ACHR", b"PGRE", b"PMIS", b"PHZD"))
+
+_XCLC = struct.Struct("<ii")
+_POSITION = struct.Struct("<fff")
+
+
+class SpatialPass(IndexPass):
+    """
+    Collects the grid position of every exterior cell and the position of
+    every placed reference inside a worldspace.
+    """
+
+    name = "spatial"
+
+    def __init__(self):
+        self.worlds: list[int] = []
+        self.cells: list[int] = []
+
+        self.cell_world = array("I")
+        self.cell_x = array("i")
+        self.cell_y = array("i")
+        self.cell_row = array("I")
+
+        self.ref_world = array("I")
+        self.ref_cell = array("I")
+        self.ref_x = array("f")
+        self.ref_y = array("f")
+        self.ref_z = array("f")
+        self.ref_row = array("I")
+
+    def enter_group(self, group: Group):
+        match group.group_type:
+            case GroupType.WorldChildren:
+                self.worlds.append(int.from_bytes(group.label, "little"))
+            case GroupType.CellChildren:
+                self.cells.append(int.from_bytes(group.label, "little"))
+
+    def leave_group(self, group: Group):
+        match group.group_type:
+            case GroupType.WorldChildren:
+                self.worlds.pop()
+            case GroupType.CellChildren:
+                self.cells.pop()
+
+    def visit(self, row: int, record: Record):
+        if not self.worlds:
+            # Interior cells have no place in the world.
+            return
+
+        if record.type == b"CELL":
+            for field in record.fields(only={b"XCLC"}):
+                x, y = _XCLC.unpack_from(field.data)
+                self.cell_world.append(self.worlds[-1])
+                self.cell_x.append(x)
+                self.cell_y.append(y)
+                self.cell_row.append(row)
+        elif record.type in PLACED_TYPES:
+            for field in record.fields(only={b"DATA"}):
+                x, y, z = _POSITION.unpack_from(field.data)
+                self.ref_world.append(self.worlds[-1])
+                self.ref_cell.append(self.cells[-1] if self.cells else 0)
+                self.ref_x.append(x)
+                self.ref_y.append(y)
+                self.ref_z.append(z)
+                self.ref_row.append(row)
+
+    def columns(self) -> dict[str, array | bytes]:
+        return {
+            "cell_world": self.cell_world,
+            "cell_x": self.cell_x,
+            "cell_y": self.cell_y,
+            "cell_row": self.cell_row,
+            "ref_world": self.ref_world,
+            "ref_cell": self.ref_cell,
+            "ref_x": self.ref_x,
+            "ref_y": self.ref_y,
+            "ref_z": self.ref_z,
+            "ref_row": self.ref_row,
+        }
+
+
+def _grid(coordinate: float) -> int:
+    return math.floor(coordinate / CELL_SIZE)
+
+
+class SpatialIndex:
+    """
+    Answers "what's in this part of the world" without walking the world's
+    groups.
+
+    Cells and references are bucketed by the exterior sub-block they fall
+    into, so a query only looks at the sub-blocks overlapping its rectangle.
+    References are bucketed by their own position rather than their parent
+    cell, which places persistent references correctly.
+    """
+
+    def __init__(self, index: ESMIndex):
+        self.index = index
+        c = index.columns
+        self.cell_world: array = c["spatial.cell_world"]
+        self.cell_x: array = c["spatial.cell_x"]
+        self.cell_y: array = c["spatial.cell_y"]
+        self.cell_row: array = c["spatial.cell_row"]
+        self.ref_world: array = c["spatial.ref_world"]
+        self.ref_cell: array = c["spatial.ref_cell"]
+        self.ref_x: array = c["spatial.ref_x"]
+        self.ref_y: array = c["spatial.ref_y"]
+        self.ref_z: array = c["spatial.ref_z"]
+        self.ref_row: array = c["spatial.ref_row"]
+
+        self._cell_buckets = self._bucket(
+            self.cell_world, self.cell_x, self.cell_y
+        )
+        self._ref_buckets = self._bucket(
+            self.ref_world,
+            [_grid(x) for x in self.ref_x],
+            [_grid(y) for y in self.ref_y],
+        )
+
+    @classmethod
+    def from_container(
+        cls, esm: ESMContainer, *, cache: bool = True
+    ) -> "SpatialIndex":
+        """
+        Returns the spatial index for an open ESM file, building and caching
+        it with the rest of the ESM index if needed.
+        """
+        return cls(ESMIndex.from_container(esm, [SpatialPass], cache=cache))
+
+    @staticmethod
+    def _bucket(worlds, xs, ys) -> dict[int, dict[tuple[int, int], array]]:
+        buckets = defaultdict(lambda: defaultdict(lambda: array("I")))
+        for i, (world, x, y) in enumerate(zip(worlds, xs, ys)):
+            key = (x >> SUB_BLOCK_SHIFT, y >> SUB_BLOCK_SHIFT)
+            buckets[world][key].append(i)
+        return {world: dict(b) for world, b in buckets.items()}
+
+    @staticmethod
+    def _candidates(
+        buckets: dict[tuple[int, int], array],
+        gx0: int,
+        gy0: int,
+        gx1: int,
+        gy1: int,
+    ):
+        sx0, sy0 = gx0 >> SUB_BLOCK_SHIFT, gy0 >> SUB_BLOCK_SHIFT
+        sx1, sy1 = gx1 >> SUB_BLOCK_SHIFT, gy1 >> SUB_BLOCK_SHIFT
+
+        if (sx1 - sx0 + 1) * (sy1 - sy0 + 1) > len(buckets):
+            # Cheaper to look at every bucket in the world than every
+            # sub-block in a huge rectangle.
+            for (sx, sy), items in buckets.items():
+                if sx0 <= sx <= sx1 and sy0 <= sy <= sy1:
+                    yield from items
+            return
+
+        for sx in range(sx0, sx1 + 1):
+            for sy in range(sy0, sy1 + 1):
+                yield from buckets.get((sx, sy), ())
+
+    def cells(
+        self, world: int, x0: float, y0: float, x1: float, y1: float
+    ) -> list[int]:
+        """
+        Returns the index rows of every exterior cell in a worldspace that
+        overlaps a rectangle.
+
+        :param world: The form ID of the worldspace.
+        :param x0: The minimum X of the rectangle, in worldspace units.
+        :param y0: The minimum Y of the rectangle, in worldspace units.
+        :param x1: The maximum X of the rectangle, in worldspace units.
+        :param y1: The maximum Y of the rectangle, in worldspace units.
+        """
+        buckets = self._cell_buckets.get(world)
+        if buckets is None:
+            return []
+
+        gx0, gy0, gx1, gy1 = _grid(x0), _grid(y0), _grid(x1), _grid(y1)
+        return sorted(
+            self.cell_row[i]
+            for i in self._candidates(buckets, gx0, gy0, gx1, gy1)
+            if gx0 <= self.cell_x[i] <= gx1 and gy0 <= self.cell_y[i] <= gy1
+        )
+
+    def refs(
+        self, world: int, x0: float, y0: float, x1: float, y1: float
+    ) -> list[int]:
+        """
+        Returns the index rows of every placed reference in a worldspace that
+        lies within a rectangle.
+
+        :param world: The form ID of the worldspace.
+        :param x0: The minimum X of the rectangle, in worldspace units.
+        :param y0: The minimum Y of the rectangle, in worldspace units.
+        :param x1: The maximum X of the rectangle, in worldspace units.
+        :param y1: The maximum Y of the rectangle, in worldspace units.
+        """
+        buckets = self._ref_buckets.get(world)
+        if buckets is None:
+            return []
+
+        gx0, gy0, gx1, gy1 = _grid(x0), _grid(y0), _grid(x1), _grid(y1)
+        return sorted(
+            self.ref_row[i]
+            for i in self._candidates(buckets, gx0, gy0, gx1, gy1)
+            if x0 <= self.ref_x[i] <= x1 and y0 <= self.ref_y[i] <= y1
+        )
@@ -1,10 +1,32 @@
+import bisect
 import enum
+import itertools
+import re
+import struct
 from typing import BinaryIO
 
 from starhopper.formats.common import Location
 from starhopper.io import BinaryReader, BinaryWriter
 
 
+#: An entry in the directory of a string container, as (ID, offset).
+_DIRECTORY_ENTRY = struct.Struct("<II")
+#: The size of each read while looking for the end of a null-terminated
+#: string.
+_CSTRING_BLOCK = 256
+_LENGTH = struct.Struct("<I")
+#: The characters that bytes which aren't valid UTF-8 are decoded to by the
+#: surrogateescape error handler.
+_ESCAPED = re.compile("[\udc80-\udcff]")
+
+
+def _decode(data: bytes) -> str:
+    try:
+        return data.decode("utf-8")
+    except UnicodeDecodeError:
+        return data.decode("cp1252")
+
+
 class StringContainerType(enum.IntEnum):
     Strings = 0
     DLStrings = 1
@@ -29,16 +51,21 @@ class StringContainer:
         self.type_ = type_
         self.header = self.parse_header(self.io)
         self._strings = {}
+        # The offset of each string, by ID.
+        self._offsets: dict[int, int] | None = None
 
     @staticmethod
     def parse_header(reader: BinaryReader):
         with reader as header:
-            header.uint32("count").uint32("size").set(
+            header.uint32("count").uint32("size")
+            size = header["count"] * _DIRECTORY_ENTRY.size
+            header.set(
                 "directory",
-                [
-                    (reader.uint32(), reader.uint32())
-                    for _ in range(header["count"])
-                ],
+                list(
+                    _DIRECTORY_ENTRY.iter_unpack(
+                        reader.read(size) if size else b""
+                    )
+                ),
             )
             header.set(
                 "loc",
@@ -51,36 +78,138 @@ class StringContainer:
         """
         Returns a dictionary of string IDs to strings.
 
+        The string data is read with a single read and sliced up in memory.
+        Use :meth:`get` when only a few strings are needed.
+
         :return:
         """
         if self._strings:
             return self._strings
 
-        self._strings = strings = {}
-
-        for string_id, offset in self.header["directory"]:
-            self.io.seek(self.header["loc"].end + offset)
-            match self.type_:
-                case StringContainerType.Strings:
-                    strings[string_id] = self.io.cstring(None)
-                    try:
-                        strings[string_id] = strings[string_id].decode("utf-8")
-                    except UnicodeDecodeError:
-                        strings[string_id] = strings[string_id].decode("cp1252")
-                case StringContainerType.DLStrings | StringContainerType.ILStrings:
-                    size = self.io.uint32()
-                    strings[string_id] = self.io.read(size)
-                    try:
-                        strings[string_id] = strings[string_id].decode("utf-8")
-                    except UnicodeDecodeError:
-                        strings[string_id] = strings[string_id].decode("cp1252")
-                case _:
-                    raise ValueError(
-                        f"Unknown string container type: {self.type_}"
-                    )
+        directory = self.header["directory"]
+        if not directory:
+            return self._strings
 
+        self.io.seek(self.header["loc"].end)
+        data = self.file.read(self.header["size"])
+        match self.type_:
+            case StringContainerType.Strings:
+                self._strings = self._split_cstrings(data, directory)
+            case StringContainerType.DLStrings | StringContainerType.ILStrings:
+                self._strings = self._split_prefixed(data, directory)
+            case _:
+                raise ValueError(f"Unknown string container type: {self.type_}")
         return self._strings
 
+    @staticmethod
+    def _split_prefixed(
+        data: bytes, directory: list[tuple[int, int]]
+    ) -> dict[int, str]:
+        """
+        Decodes the length-prefixed strings in a block of string data.
+        """
+        strings = {}
+        for string_id, offset in directory:
+            (size,) = _LENGTH.unpack_from(data, offset)
+            start = offset + _LENGTH.size
+            strings[string_id] = _decode(data[start : start + size])
+        return strings
+
+    @staticmethod
+    def _split_cstrings(
+        data: bytes, directory: list[tuple[int, int]]
+    ) -> dict[int, str]:
+        """
+        Decodes the null-terminated strings in a block of string data.
+
+        The block is split on every null byte and decoded as UTF-8 in one
+        go. Null bytes never appear inside multi-byte UTF-8 characters, and
+        each invalid byte becomes a single escape character, so the decoded
+        pieces line up with the raw ones. Only the pieces containing invalid
+        bytes are decoded again on their own, falling back to cp1252.
+        """
+        pieces = data.split(b"\x00")
+        text = data.decode("utf-8", "surrogateescape")
+        texts = text.split("\x00")
+
+        invalid = [m.start() for m in _ESCAPED.finditer(text)]
+        if invalid:
+            character_starts = list(
+                itertools.accumulate(
+                    (len(piece) + 1 for piece in texts), initial=0
+                )
+            )
+            for position in invalid:
+                i = bisect.bisect_right(character_starts, position) - 1
+                texts[i] = _decode(pieces[i])
+
+        # The piece starting at each offset.
+        starts = dict(
+            zip(
+                itertools.accumulate(
+                    (len(piece) + 1 for piece in pieces), initial=0
+                ),
+                range(len(pieces)),
+            )
+        )
+
+        strings = {}
+        for string_id, offset in directory:
+            i = starts.get(offset)
+            if i is None:
+                # Points into the middle of another string, sharing its end.
+                end = data.find(b"\x00", offset)
+                strings[string_id] = _decode(
+                    data[offset : end if end != -1 else len(data)]
+                )
+            else:
+                strings[string_id] = texts[i]
+        return strings
+
+    def get(self, string_id: int) -> str | None:
+        """
+        Returns a single string, if it exists, reading and decoding only
+        that string.
+
+        The first lookup builds a table of offsets from the directory, which
+        is much cheaper than decoding every string.
+
+        :param string_id: The ID of the string.
+        """
+        if self._strings:
+            return self._strings.get(string_id)
+
+        if self._offsets is None:
+            self._offsets = dict(self.header["directory"])
+
+        offset = self._offsets.get(string_id)
+        if offset is None:
+            return None
+        return self._read(offset)
+
+    def _read(self, offset: int) -> str:
+        """
+        Reads and decodes the string at an offset into the string data.
+        """
+        self.io.seek(self.header["loc"].end + offset)
+        match self.type_:
+            case StringContainerType.Strings:
+                # Read a block at a time rather than a byte at a time.
+                blocks = []
+                while block := self.file.read(_CSTRING_BLOCK):
+                    end = block.find(b"\x00")
+                    if end != -1:
+                        blocks.append(block[:end])
+                        break
+                    blocks.append(block)
+                data = b"".join(blocks)
+            case StringContainerType.DLStrings | StringContainerType.ILStrings:
+                size = self.io.uint32()
+                data = self.io.read(size) if size else b""
+            case _:
+                raise ValueError(f"Unknown string container type: {self.type_}")
+        return _decode(data)
+
     def save(self, file: BinaryIO):
         """
         Saves the string container to a file.
@@ -0,0 +1,277 @@
+"""
+Merges many archives and a directory of loose files into a single tree.
+"""
+import contextlib
+import dataclasses
+import os
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import BinaryIO, Iterable, Iterator
+
+from starhopper.formats.archive import glob_rows, normalize_path
+from starhopper.formats.btdx.file import BA2Container
+from starhopper.formats.common import FileIdentity, read_columns, write_columns
+
+VFS_MAGIC = b"SHVF"
+
+
+@dataclasses.dataclass(frozen=True)
+class VirtualStat:
+    #: The path of the file, as stored by whatever provides it.
+    path: str
+    #: The uncompressed size of the file.
+    size: int
+    #: The archive containing the file, or the loose file itself.
+    source: Path
+    #: True if the file is a loose file rather than in an archive.
+    loose: bool
+
+
+class VirtualFileSystem:
+    """
+    A read-only view over many archives and an optional directory of loose
+    files, as the game sees them.
+
+    Archives are mounted in priority order, with files in later archives
+    overriding those in earlier ones. Loose files override every archive.
+
+    Every path is resolved with a single lookup in a merged index, which can
+    be cached on disk. The cache is thrown away if any archive changes, while
+    loose files are always scanned when the file system is created.
+    """
+
+    def __init__(
+        self,
+        archives: Iterable[Path | str],
+        *,
+        data: Path | str | None = None,
+        cache: Path | str | None = None,
+        workers: int | None = None,
+    ):
+        """
+        :param archives: The archives to mount, lowest priority first.
+        :param data: A directory of loose files to mount over the archives.
+        :param cache: Where to store the merged index of the archives.
+        :param workers: The number of archives to open at once when the
+                        index has to be built.
+        """
+        self.archives = [Path(archive).resolve() for archive in archives]
+        self.data = None if data is None else Path(data)
+        self._containers: dict[int, BA2Container] = {}
+        self._handles: list[BinaryIO] = []
+
+        identities = [FileIdentity.of(archive) for archive in self.archives]
+        columns = None
+        if cache is not None:
+            columns = read_columns(
+                Path(cache), VFS_MAGIC, self._identity(identities)
+            )
+            if columns is not None and not self._matches(columns, identities):
+                columns = None
+
+        if columns is None:
+            columns = self._build(identities, workers)
+            if cache is not None:
+                try:
+                    write_columns(
+                        Path(cache),
+                        VFS_MAGIC,
+                        self._identity(identities),
+                        columns,
+                    )
+                except OSError:
+                    pass
+
+        self._mounts: array = columns["mounts"]
+        self._rows: array = columns["rows"]
+        self._sizes: array = columns["sizes"]
+        self._paths: list[str] = (
+            columns["paths"].decode("utf-8").split("\n") if self._mounts else []
+        )
+        self._index: dict[str, int] = {
+            normalize_path(path): row for row, path in enumerate(self._paths)
+        }
+        # Every normalized path, sorted, built the first time it's needed.
+        self._sorted: list[str] | None = None
+
+        # Loose files, by normalized path.
+        self._loose: dict[str, Path] = {}
+        if self.data is not None:
+            for root, _, names in os.walk(self.data):
+                for name in names:
+                    path = Path(root, name)
+                    relative = path.relative_to(self.data).as_posix()
+                    self._loose[normalize_path(relative)] = path
+
+    @staticmethod
+    def _identity(identities: list[FileIdentity]) -> FileIdentity:
+        # A quick check before comparing every archive.
+        return FileIdentity(
+            size=sum(identity.size for identity in identities),
+            mtime_ns=max(
+                (identity.mtime_ns for identity in identities), default=0
+            ),
+        )
+
+    def _matches(
+        self, columns: dict[str, array | bytes], identities: list[FileIdentity]
+    ) -> bool:
+        return (
+            "rows" in columns
+            and columns["archives.paths"].decode("utf-8")
+            == "\n".join(str(archive) for archive in self.archives)
+            and list(columns["archives.sizes"])
+            == [identity.size for identity in identities]
+            and list(columns["archives.mtimes"])
+            == [identity.mtime_ns for identity in identities]
+        )
+
+    def _build(
+        self, identities: list[FileIdentity], workers: int | None
+    ) -> dict[str, array | bytes]:
+        with ThreadPoolExecutor(workers) as pool:
+            listings = list(
+                pool.map(
+                    lambda mount: [
+                        (file.path, file.size)
+                        for file in self._container(mount).files()
+                    ],
+                    range(len(self.archives)),
+                )
+            )
+
+        # Later archives replace the entries of earlier ones. The archives
+        # were only just loaded, so files are listed in row order.
+        merged: dict[str, tuple[str, int, int, int]] = {}
+        for mount, listing in enumerate(listings):
+            for row, (path, size) in enumerate(listing):
+                merged[normalize_path(path)] = (path, mount, row, size)
+
+        return {
+            "archives.paths": "\n".join(
+                str(archive) for archive in self.archives
+            ).encode("utf-8"),
+            "archives.sizes": array(
+                "Q", [identity.size for identity in identities]
+            ),
+            "archives.mtimes": array(
+                "Q", [identity.mtime_ns for identity in identities]
+            ),
+            "paths": "\n".join(p for p, _, _, _ in merged.values()).encode(
+                "utf-8"
+            ),
+            "mounts": array("H", [m for _, m, _, _ in merged.values()]),
+            "rows": array("I", [r for _, _, r, _ in merged.values()]),
+            "sizes": array("Q", [s for _, _, _, s in merged.values()]),
+        }
+
+    def _container(self, mount: int) -> BA2Container:
+        container = self._containers.get(mount)
+        if container is None:
+            handle = open(self.archives[mount], "rb")
+            self._handles.append(handle)
+            container = BA2Container(handle)
+            self._containers[mount] = container
+        return container
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        for handle in self._handles:
+            handle.close()
+        self._handles.clear()
+        self._containers.clear()
+
+    def __len__(self):
+        return len(self._index.keys() | self._loose.keys())
+
+    def __contains__(self, path: str):
+        return self.exists(path)
+
+    def paths(self) -> Iterator[str]:
+        """
+        Returns the normalized path of every file, in no particular order.
+        """
+        yield from self._loose
+        for path in self._index:
+            if path not in self._loose:
+                yield path
+
+    def exists(self, path: str) -> bool:
+        """
+        Returns True if a file with the given path exists in any mount.
+        """
+        path = normalize_path(path)
+        return path in self._loose or path in self._index
+
+    def stat(self, path: str) -> VirtualStat:
+        """
+        Returns the size and source of the file that wins for a path.
+
+        :raises FileNotFoundError: If no mount contains the path.
+        """
+        normalized = normalize_path(path)
+        loose = self._loose.get(normalized)
+        if loose is not None:
+            return VirtualStat(
+                path=loose.relative_to(self.data).as_posix(),
+                size=loose.stat().st_size,
+                source=loose,
+                loose=True,
+            )
+
+        row = self._index.get(normalized)
+        if row is None:
+            raise FileNotFoundError(path)
+
+        return VirtualStat(
+            path=self._paths[row],
+            size=self._sizes[row],
+            source=self.archives[self._mounts[row]],
+            loose=False,
+        )
+
+    @contextlib.contextmanager
+    def open(self, path: str, *, cache: bool = True):
+        """
+        Opens the file that wins for a path.
+
+        :param cache: Whether an archived file may be served from, and added
+                      to, its archive's cache.
+
+        :raises FileNotFoundError: If no mount contains the path.
+        :return: A file-like object.
+        """
+        normalized = normalize_path(path)
+        loose = self._loose.get(normalized)
+        if loose is not None:
+            with open(loose, "rb") as io:
+                yield io
+            return
+
+        row = self._index.get(normalized)
+        if row is None:
+            raise FileNotFoundError(path)
+
+        container = self._container(self._mounts[row])
+        try:
+            file = container.file_at(self._rows[row])
+        except IndexError:
+            raise FileNotFoundError(path)
+
+        with file.open(cache=cache) as io:
+            yield io
+
+    def glob(self, pattern: str) -> list[str]:
+        """
+        Returns the sorted, normalized paths of every file matching a glob
+        pattern, as matched by :func:`glob_rows`.
+        """
+        if self._sorted is None:
+            self._sorted = sorted(self.paths())
+        return [self._sorted[row] for row in glob_rows(self._sorted, pattern)]
@@ -10,7 +10,11 @@ from PySide6.QtWidgets import (
     QFileDialog,
 )
 
-from starhopper.formats.archive import ArchiveContainer, AbstractFile
+from starhopper.formats.archive import (
+    ArchiveContainer,
+    AbstractFile,
+    normalize_path,
+)
 from starhopper.gui.common import tr, monospace
 from starhopper.gui.settings import HasSettings
 from starhopper.gui.viewers.model_viewer import ModelViewer
@@ -24,7 +28,7 @@ class ArchiveViewerNode(QTreeWidgetItem):
         self.container = container
         self.file = file
 
-        self.setText(0, file.path)
+        self.setText(0, normalize_path(file.path).rpartition("/")[2])
         self.setText(1, f"{file.size} bytes")
         self.setFont(1, monospace())
         self.setTextAlignment(1, Qt.AlignRight)
@@ -32,6 +36,24 @@ class ArchiveViewerNode(QTreeWidgetItem):
         self.setCheckState(0, Qt.Unchecked)
 
 
+class ArchiveViewerDirectory(QTreeWidgetItem):
+    """
+    A directory in the archive, whose contents are only added once it's
+    expanded.
+    """
+
+    def __init__(self, path: str):
+        super().__init__()
+        #: The normalized path of the directory.
+        self.path = path
+        self.populated = False
+
+        self.setText(0, path.rpartition("/")[2])
+        self.setChildIndicatorPolicy(QTreeWidgetItem.ShowIndicator)
+        self.setFlags(self.flags() | Qt.ItemIsUserCheckable)
+        self.setCheckState(0, Qt.Unchecked)
+
+
 class ArchiveViewer(HasSettings, Viewer):
     def __init__(self, container: ArchiveContainer, working_area: QLayout):
         super().__init__(working_area=working_area)
@@ -52,12 +74,10 @@ class ArchiveViewer(HasSettings, Viewer):
             )
         )
         self.browser.itemDoubleClicked.connect(self.on_item_double_clicked)
+        self.browser.itemExpanded.connect(self.on_item_expanded)
 
-        # TODO: Build up a directory tree here instead of lumping it all into
-        #       the root.
-        for file in container.files():
-            item = ArchiveViewerNode(self.container, file)
-            self.browser.addTopLevelItem(item)
+        self.index = container.path_index()
+        self.populate(self.browser.invisibleRootItem(), "")
 
         self.export_button = QPushButton(tr("ArchiveViewer", "&Export", None))
         self.export_button.clicked.connect(self.on_export_button_clicked)
@@ -65,6 +85,25 @@ class ArchiveViewer(HasSettings, Viewer):
         self.layout.insertWidget(0, self.browser)
         self.layout.insertWidget(1, self.export_button)
 
+    def populate(self, parent: QTreeWidgetItem, directory: str):
+        """
+        Adds the contents of a directory to the tree, under parent.
+        """
+        directories, files = self.index.listdir(directory)
+        prefix = f"{directory}/" if directory else ""
+        parent.addChildren(
+            [ArchiveViewerDirectory(f"{prefix}{name}") for name in directories]
+            + [
+                ArchiveViewerNode(self.container, self.index.get(prefix + name))
+                for name in files
+            ]
+        )
+
+    def on_item_expanded(self, item: QTreeWidgetItem):
+        if isinstance(item, ArchiveViewerDirectory) and not item.populated:
+            item.populated = True
+            self.populate(item, item.path)
+
     def on_item_double_clicked(self, item: QTreeWidgetItem, column: int):
         if not isinstance(item, ArchiveViewerNode):
             return
@@ -81,16 +120,21 @@ class ArchiveViewer(HasSettings, Viewer):
                 )
 
     def on_export_button_clicked(self):
-        items_to_extract = [
-            item
-            for item in self.browser.findItems(
-                "", Qt.MatchContains | Qt.MatchRecursive
-            )
-            if isinstance(item, ArchiveViewerNode)
-            and item.checkState(0) == Qt.Checked
-        ]
-
-        if not items_to_extract:
+        # Checked directories export everything beneath them, whether or
+        # not they've been expanded.
+        files_to_extract = {}
+        for item in self.browser.findItems(
+            "", Qt.MatchContains | Qt.MatchRecursive
+        ):
+            if item.checkState(0) != Qt.Checked:
+                continue
+            if isinstance(item, ArchiveViewerDirectory):
+                for file in self.index.walk(item.path):
+                    files_to_extract[normalize_path(file.path)] = file
+            elif isinstance(item, ArchiveViewerNode):
+                files_to_extract[normalize_path(item.file.path)] = item.file
+
+        if not files_to_extract:
             return
 
         directory = QFileDialog.getExistingDirectory(
@@ -99,23 +143,46 @@ class ArchiveViewer(HasSettings, Viewer):
             self.settings.value("last_open_dir", "."),
             QFileDialog.ShowDirsOnly,
         )
+        if not directory:
+            return
 
         # Should probably be moved into a thread.
-        for item in items_to_extract:
-            item.file.extract_into(Path(directory), overwrite=True)
+        self.container.extract_all(
+            Path(directory),
+            files_to_extract.values(),
+            overwrite=True,
+        )
 
     def settings_group_name(self) -> str:
         return "archive_viewer"
 
     def navigate(self, path: list[str]):
         component = path.pop(0)
+        file = self.index.get(component)
+        if file is None:
+            return
 
-        items = self.browser.findItems(
-            component, Qt.MatchExactly | Qt.MatchRecursive
-        )
-
-        for item in items:
-            if item.file.path == component:
+        # Expand each directory leading to the file, which populates it.
+        parent = self.browser.invisibleRootItem()
+        directory = normalize_path(component).rpartition("/")[0]
+        if directory:
+            parts = directory.split("/")
+            for i in range(len(parts)):
+                child_path = "/".join(parts[: i + 1])
+                for row in range(parent.childCount()):
+                    child = parent.child(row)
+                    if (
+                        isinstance(child, ArchiveViewerDirectory)
+                        and child.path == child_path
+                    ):
+                        child.setExpanded(True)
+                        self.on_item_expanded(child)
+                        parent = child
+                        break
+
+        for row in range(parent.childCount()):
+            item = parent.child(row)
+            if isinstance(item, ArchiveViewerNode) and item.file is file:
                 self.browser.setCurrentItem(item)
                 self.on_item_double_clicked(item, 0)
                 break
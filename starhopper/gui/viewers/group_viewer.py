@@ -90,24 +90,19 @@ class GroupLoaderThread(QRunnable):
             if child.flags & RecordFlag.Deleted:
                 item.setForeground(0, QtGui.QBrush(ColorRed))
 
-            for field in child.fields():
+            for field in child.fields(only={b"EDID"}):
                 # As a special case, we pull up any EDID fields to the top
                 # level of the tree as a label for the record.
-                if field.type == b"EDID":
-                    with BytesIO(field.data) as data:
-                        io = BinaryReader(data)
-                        with io as edid:
-                            edid.cstring("name")
-                            item.setText(2, edid.data["name"])
-                            item.setToolTip(
-                                2, tr("GroupViewer", "Editor ID", None)
-                            )
-                            item.setForeground(
-                                2,
-                                QtGui.QBrush(ColorPurple),
-                            )
-
-                    break
+                with BytesIO(field.data) as data:
+                    io = BinaryReader(data)
+                    with io as edid:
+                        edid.cstring("name")
+                        item.setText(2, edid.data["name"])
+                        item.setToolTip(2, tr("GroupViewer", "Editor ID", None))
+                        item.setForeground(
+                            2,
+                            QtGui.QBrush(ColorPurple),
+                        )
 
             self.viewer.details.addTopLevelItem(item)
             self.group.file.io.seek(child.loc.end)
@@ -135,10 +135,7 @@ class SearchIndexThread(QRunnable):
                                     search.ItemType.FORM_ID,
                                 )
 
-                                for field in record.fields():
-                                    if field.type != b"EDID":
-                                        continue
-
+                                for field in record.fields(only={b"EDID"}):
                                     with BytesIO(field.data) as data:
                                         io = BinaryReader(data)
                                         label = io.cstring()